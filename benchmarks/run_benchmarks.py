@@ -0,0 +1,310 @@
+"""
+Benchmarks for the Build from template stages of ebo_app_factory.
+
+Builds a synthetic template and workbook of configurable size from the exports in
+tests/data, then times each stage on its own:
+
+- parse: ApplicationTemplate parsing the template export
+- load: FactoryInputsFromSpreadsheet reading the workbook
+- make_copies: ApplicationFactory.make_copies
+- make_copies_in_folders: ApplicationFactory.make_copies_in_folders
+- to_pretty_xml: EBOXMLBuilder.to_pretty_xml of the whole document
+- write_xml: EBOXMLBuilder.write_xml of the whole document
+
+Each stage is reported with its best time over --repeat runs, its throughput and the
+peak resident set size (RSS) of the process after the stage. Run with --trace-memory to
+also report the peak memory allocated by each stage (measured with tracemalloc, in a
+separate run so the timings are not affected).
+
+Usage:
+
+    python benchmarks/run_benchmarks.py --rows 5000 --template-size 4
+    python benchmarks/run_benchmarks.py --rows 20000 --json results.json
+    python benchmarks/run_benchmarks.py --rows 20000 --compare results.json
+
+--json saves the results, --compare prints the change in time of each stage against
+results saved by an earlier run (eg from the previous release).
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import openpyxl
+
+from ebo_app_factory.instrumentation import get_peak_rss
+from ebo_app_factory.xml_app_factory import (
+    ApplicationFactory,
+    ApplicationTemplate,
+    FactoryInputsFromSpreadsheet,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "data")
+
+# template exports in tests/data and the placeholders used in each
+TEMPLATES = {
+    "emergency-lighting": (
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+        ["ICG-L04M", "ICG_L04M", "external_bindings_ICG"],
+    ),
+    "hive-controller": (
+        "Zoneworks XT Hive Controller 1 EBO app Export 2024-04-19.xml",
+        ["Zoneworks XT Hive Controller 1", "IRD-ICG-B03-SEL-01"],
+    ),
+}
+# placeholder of the folder column used by make_copies_in_folders
+FOLDER_PLACEHOLDER = "{{level}}"
+SHEETNAME = "bench"
+
+STAGES = [
+    "parse",
+    "load",
+    "make_copies",
+    "make_copies_in_folders",
+    "to_pretty_xml",
+    "write_xml",
+]
+
+
+def make_template(template_name, template_size, xml_out_file):
+    """
+    writes a template export with the ExportedObjects of template_name repeated
+    template_size times, each repeat named with a suffix, and returns its size in bytes.
+    """
+    template_filename = TEMPLATES[template_name][0]
+    tree = ET.parse(os.path.join(DATA_DIR, template_filename))
+    exported_objects = tree.getroot().find("ExportedObjects")
+    originals = list(exported_objects)
+    for i in range(1, template_size):
+        for element in originals:
+            element_copy = copy.deepcopy(element)
+            element_copy.set("NAME", "%s %d" % (element.get("NAME"), i + 1))
+            exported_objects.append(element_copy)
+    tree.write(xml_out_file, encoding="utf-8", xml_declaration=True)
+    return os.path.getsize(xml_out_file)
+
+
+def make_workbook(template_name, rows, levels, xl_out_file):
+    """
+    writes a workbook with a sheet of rows copies of template_name, each copy in one of
+    levels folders.
+    """
+    placeholders = TEMPLATES[template_name][1]
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(SHEETNAME)
+    ws.append(placeholders + [FOLDER_PLACEHOLDER])
+    for i in range(rows):
+        ws.append(
+            ["%s %05d" % (placeholder, i) for placeholder in placeholders]
+            + ["L%02d" % (i % levels)]
+        )
+    wb.save(xl_out_file)
+
+
+class Benchmark(object):
+
+    def __init__(self, template_path, xlfile, work_dir):
+        self.template_path = template_path
+        self.xlfile = xlfile
+        self.work_dir = work_dir
+
+    def make_factory(self):
+        return ApplicationFactory(
+            template_child_elements_dict=self.template.template_child_elements_dict,
+            factory_placeholders=self.factory_inputs.factory_placeholders,
+            factory_copy_substrings=self.factory_inputs.factory_copy_substrings,
+            xml_out_file=os.path.join(self.work_dir, "output.xml"),
+            show_progress=False,
+        )
+
+    def run_stage(self, stage):
+        """
+        runs one stage, setting up what it needs from the earlier stages, and returns
+        (seconds, amount processed, unit of the amount).
+        """
+        if stage == "parse":
+            start = time.perf_counter()
+            self.template = ApplicationTemplate(self.template_path)
+            seconds = time.perf_counter() - start
+            return seconds, os.path.getsize(self.template_path), "B"
+        if stage == "load":
+            start = time.perf_counter()
+            self.factory_inputs = FactoryInputsFromSpreadsheet(
+                self.xlfile, sheetname=SHEETNAME
+            )
+            seconds = time.perf_counter() - start
+            return seconds, len(self.factory_inputs.factory_copy_substrings), "rows"
+        if stage in ("make_copies", "make_copies_in_folders"):
+            app_factory = self.make_factory()
+            start = time.perf_counter()
+            if stage == "make_copies":
+                app_factory.make_copies()
+            else:
+                app_factory.make_copies_in_folders(FOLDER_PLACEHOLDER)
+            seconds = time.perf_counter() - start
+            self.app_factory = app_factory
+            copies = len(app_factory.factory_copy_substrings) * len(
+                app_factory.template_child_elements_dict["ExportedObjects"]
+            )
+            return seconds, copies, "copies"
+        xml_builder = self.get_document()
+        if stage == "to_pretty_xml":
+            start = time.perf_counter()
+            document = xml_builder.to_pretty_xml()
+            seconds = time.perf_counter() - start
+            return seconds, len(document.encode("utf-8")), "B"
+        if stage == "write_xml":
+            xml_out_file = os.path.join(self.work_dir, "output.xml")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                xml_builder.write_xml(xml_out_file)
+            seconds = time.perf_counter() - start
+            return seconds, os.path.getsize(xml_out_file), "B"
+        raise ValueError(f"Unknown stage '{stage}'")
+
+    def get_document(self):
+        """
+        returns the EBOXMLBuilder of the copies in folders, with every copy added.
+        """
+        if not hasattr(self, "xml_builder"):
+            self.app_factory.make_document(write_result=False)
+            self.xml_builder = self.app_factory.xml_builder
+        return self.xml_builder
+
+
+def run_benchmarks(args, work_dir):
+    template_path = os.path.join(work_dir, "template.xml")
+    xlfile = os.path.join(work_dir, "items.xlsx")
+    make_template(args.template, args.template_size, template_path)
+    make_workbook(args.template, args.rows, args.levels, xlfile)
+
+    results = {}
+    for repeat in range(args.repeat):
+        benchmark = Benchmark(template_path, xlfile, work_dir)
+        for stage in STAGES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds, amount, unit = benchmark.run_stage(stage)
+            result = results.setdefault(
+                stage, {"seconds": seconds, "amount": amount, "unit": unit}
+            )
+            result["seconds"] = min(result["seconds"], seconds)
+            if repeat == 0:
+                # peak RSS never goes down, later runs would report the first run's peak
+                result["peak_rss"] = get_peak_rss()
+
+    if args.trace_memory:
+        benchmark = Benchmark(template_path, xlfile, work_dir)
+        for stage in STAGES:
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                benchmark.run_stage(stage)
+            results[stage]["peak_traced"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return results
+
+
+def format_amount(amount, unit):
+    if unit == "B":
+        return "%.1f MB" % (amount / 1e6)
+    return "%d %s" % (amount, unit)
+
+
+def format_bytes(amount):
+    if amount is None:
+        return "-"
+    return "%.0f MB" % (amount / 1e6)
+
+
+def print_results(results, baseline=None):
+    header = ["stage", "time", "amount", "throughput", "peak RSS"]
+    traced = any("peak_traced" in result for result in results.values())
+    if traced:
+        header.append("peak traced")
+    if baseline is not None:
+        header.append("vs baseline")
+    rows = [header]
+    for stage, result in results.items():
+        seconds = result["seconds"]
+        throughput = result["amount"] / seconds if seconds else float("inf")
+        row = [
+            stage,
+            "%.3f s" % seconds,
+            format_amount(result["amount"], result["unit"]),
+            format_amount(throughput, result["unit"]) + "/s",
+            format_bytes(result["peak_rss"]),
+        ]
+        if traced:
+            row.append(format_bytes(result.get("peak_traced")))
+        if baseline is not None:
+            baseline_result = baseline.get(stage)
+            if baseline_result is None or not baseline_result["seconds"]:
+                row.append("-")
+            else:
+                change = seconds / baseline_result["seconds"] - 1
+                row.append("%+.0f%%" % (change * 100))
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Build from template stages of ebo_app_factory."
+    )
+    parser.add_argument(
+        "--template",
+        choices=sorted(TEMPLATES),
+        default="emergency-lighting",
+        help="template export in tests/data to build the synthetic template from",
+    )
+    parser.add_argument(
+        "--template-size",
+        type=int,
+        default=1,
+        help="number of times the template's ExportedObjects are repeated",
+    )
+    parser.add_argument(
+        "--rows", type=int, default=1000, help="number of copies in the workbook"
+    )
+    parser.add_argument(
+        "--levels", type=int, default=20, help="number of folders the copies are in"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs of each stage, the best is kept"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also measure the peak memory allocated by each stage",
+    )
+    parser.add_argument("--json", help="save the results to this json file")
+    parser.add_argument("--compare", help="compare with results saved by --json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args, work_dir)
+
+    print(
+        "%s template x%d, %d rows in %d folders, best of %d runs\n"
+        % (args.template, args.template_size, args.rows, args.levels, args.repeat)
+    )
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
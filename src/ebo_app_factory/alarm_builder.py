@@ -1,5 +1,7 @@
+import logging
 import xml.etree.ElementTree as ET
 from .ebo_xml_builder import EBOXMLBuilder
+from .reporting import report
 
 
 class EBOAlarmBuilder(EBOXMLBuilder):
@@ -290,8 +292,9 @@ class EBOAlarmBuilder(EBOXMLBuilder):
         </OI>
         """
         if not conditions_values:
-            print(
-                "Warning: No filters provided for Sum Alarm. Sum Alarm will capture everything."
+            report(
+                "Warning: No filters provided for Sum Alarm. Sum Alarm will capture everything.",
+                level=logging.WARNING,
             )
         alarm = self._create_alarm_oi(
             name=name, alarm_type=self.SUM_ALARM_TYPE, **kwargs
@@ -1,5 +1,8 @@
+import os
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
+from .instrumentation import trace_stage, trace_timer
+from .reporting import report
+from .xmlutils import to_pretty_xml, write_pretty_xml_document
 
 
 class EBOXMLBuilder:
@@ -22,6 +25,10 @@ class EBOXMLBuilder:
 
     FOLDER_TYPE = "system.base.Folder"
     HYPERLINK_TYPE = "client.Hyperlink"
+    # tags of elements whose text is written as a CDATA section
+    CDATA_TAGS = ()
+    # set to an instrumentation.Tracer to report serialization time and files written
+    tracer = None
 
     def __init__(
         self,
@@ -175,6 +182,15 @@ class EBOXMLBuilder:
         # they are always in sync
         self.object_types.append(element)
 
+    def set_object_types(self, elements):
+        """
+        Replaces the children of the Types section of the XML object set.
+        Parameters:
+            elements (list): A list of XML elements representing the object types.
+        """
+        del self.object_types[:]
+        self.object_types.extend(elements)
+
     def add_to_exported_objects(self, elements):
         """
         Adds elements to the ExportedObjects section of the XML object set.
@@ -214,8 +230,8 @@ class EBOXMLBuilder:
         Returns:
             str: Pretty-printed XML string.
         """
-        rough = ET.tostring(self.object_set, "utf-8")
-        return minidom.parseString(rough).toprettyxml(indent="  ")
+        with trace_timer(self.tracer, "serialization"):
+            return to_pretty_xml(self.object_set, cdata_tags=self.CDATA_TAGS)
 
     def get_object_set(self):
         """
@@ -225,17 +241,33 @@ class EBOXMLBuilder:
         """
         return self.object_set
 
-    def write_xml(self, file_path):
+    def write_xml_stream(self, stream):
+        """
+        Writes the pretty-printed XML to a text stream. The header, MetaInformation, Types
+        and each ExportedObjects child are written to the stream as they are serialized,
+        the whole pretty-printed document is never held in memory.
+
+        Parameters:
+            stream (TextIO): The stream to write to, eg a file opened in text mode.
+        """
+        write_pretty_xml_document(stream, self.object_set, cdata_tags=self.CDATA_TAGS)
+
+    def write_xml(self, file_path, show_progress=True):
         """
         Writes the pretty-printed XML to the specified file.
 
         Parameters:
             file_path (str): Path to the output file.
+            show_progress (bool): Report the file written, see reporting.report.
         """
-        xml_str = self.to_pretty_xml()
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(xml_str)
-        print(f"XML written to {file_path}")
+        with trace_stage(self.tracer, "write_xml", file=file_path):
+            with open(file_path, "w", encoding="utf-8") as f:
+                with trace_timer(self.tracer, "serialization"):
+                    self.write_xml_stream(f)
+        if self.tracer is not None:
+            self.tracer.file_written(file_path, os.path.getsize(file_path))
+        if show_progress:
+            report(f"XML written to {file_path}")
 
     @staticmethod
     def append_child(parent, child):
@@ -0,0 +1,424 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from .xmlutils import (
+    RawXMLElement,
+    read_template_child_spans,
+    to_etree,
+    to_pretty_xml_fragment,
+    to_xml_string,
+)
+
+
+def get_file_signature(file_path):
+    """
+    Returns the (resolved path, modified time in ns, size in bytes) tuple used to check
+    whether a cached copy of a file is still current.
+    """
+    resolved_path = os.path.realpath(file_path)
+    stat = os.stat(resolved_path)
+    return (resolved_path, stat.st_mtime_ns, stat.st_size)
+
+
+class TemplateCache(object):
+    """
+    A cache of parsed application templates, keyed by resolved file path, modified time
+    and size.
+
+    Each template file is read once and the exact xml text of its Types and
+    ExportedObjects child elements is kept as strings (read_template_child_spans), which
+    ApplicationFactory compiles and copies directly. The same dictionary is shared
+    read-only by every group using that template, so a template_map where nine sheets
+    point at three files only reads three files.
+
+    If cache_dir is set, parsed templates are also saved there as json, so a later run
+    against unchanged template files skips parsing entirely. An entry is reparsed
+    whenever the file's modified time or size changes.
+
+    Example:
+
+        template_cache = TemplateCache(cache_dir=".ebo_app_factory_cache")
+        elements = template_cache.get_template_child_elements_dict(
+            "examples/VAV-L21-INT4 application special.xml"
+        )
+        elements = {
+            'Types': ['<ObjectType Name="udt...">...</ObjectType>'],
+            'ExportedObjects': ['<OI NAME="VAV-L21-INT4" TYPE="system.base.Folder">...</OI>'],
+        }
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._templates = {}
+        # number of templates parsed and loaded from cache_dir, for reporting
+        self.parsed = 0
+        self.loaded = 0
+
+    def get_template_child_elements_dict(self, template_path):
+        """
+        returns the dictionary of lists of Types and ExportedObjects child element xml
+        strings for the template file, parsing it only if it is not already cached.
+        """
+        signature = get_file_signature(template_path)
+        elements = self._templates.get(signature)
+        if elements is None:
+            elements = self.load(signature)
+            if elements is None:
+                elements = self.parse(template_path)
+                self.save(signature, elements)
+            self._templates[signature] = elements
+        return elements
+
+    def parse(self, template_path):
+        # sliced from the file as is, without building a tree
+        elements = read_template_child_spans(template_path)[1]
+        self.parsed += 1
+        return elements
+
+    def get_cache_file(self, signature):
+        resolved_path = signature[0]
+        name = hashlib.sha256(resolved_path.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "template_" + name + ".json")
+
+    def load(self, signature):
+        """
+        returns the cached elements for the file signature from self.cache_dir, or None if
+        there is no cache dir, no cache file or the file has changed since it was cached.
+        """
+        if self.cache_dir is None:
+            return None
+        cache_file = self.get_cache_file(signature)
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("signature") != list(signature):
+            return None
+        self.loaded += 1
+        return cached["elements"]
+
+    def save(self, signature, elements):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_file = self.get_cache_file(signature)
+        # write to a temporary file first so a crash never leaves a partial cache file
+        temp_file = cache_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"signature": list(signature), "elements": elements}, f)
+        os.replace(temp_file, cache_file)
+
+
+class ObjectTypeCache(object):
+    """
+    A cache of the Types (ObjectType elements) written to documents, keyed by Name.
+
+    Each template ObjectType is converted and pretty-printed once, the first time it is
+    used, and kept as a RawXMLElement laid out for the Types section. Every document
+    made with the cache, including every split file of make_document, writes the same
+    fragments without converting or serializing them again.
+
+    ObjectTypes are deduplicated by Name: a type defined by several templates (eg the
+    same udt exported with two applications) is written once per document, from the
+    first template that defined it. ApplicationFactoryManager shares one ObjectTypeCache
+    across all its groups, so each type is serialized once per run.
+
+    Example:
+
+        type_cache = ObjectTypeCache()
+        type_cache.get_object_types(template_child_elements_dict["Types"])
+        [<Element 'ObjectType' at 0x7f5665bec700>]
+        type_cache.converted
+        1
+    """
+
+    # depth of the Types children in the document: ObjectSet > Types > ObjectType
+    DEPTH = 2
+
+    def __init__(self, cdata_tags=()):
+        self.cdata_tags = tuple(cdata_tags)
+        # {Name: RawXMLElement}
+        self._object_types = {}
+        # {id(template element): (template element, Name)}
+        self._names = {}
+        # number of ObjectTypes converted, for reporting
+        self.converted = 0
+
+    def __getstate__(self):
+        # sent to worker processes without the template elements, keyed by id
+        state = self.__dict__.copy()
+        state["_names"] = {}
+        return state
+
+    def get_object_types(self, types):
+        """
+        returns the pretty-printed RawXMLElement of each template ObjectType in types
+        (minidom Elements, ElementTree Elements or xml strings), without duplicate Names,
+        in the order they first appear.
+        """
+        object_types = {}
+        for element in types:
+            name = self.get_name(element)
+            if name not in object_types:
+                object_types[name] = self._object_types[name]
+        return list(object_types.values())
+
+    def get_name(self, element):
+        """
+        returns the Name of a template ObjectType, converting it on first use. Types
+        without a Name are keyed by their xml string.
+        """
+        cached = self._names.get(id(element))
+        if cached is not None:
+            return cached[1]
+        etree_element = to_etree(element)
+        name = etree_element.get("Name")
+        if name is None:
+            name = to_xml_string(element)
+        if name not in self._object_types:
+            self._object_types[name] = RawXMLElement(
+                to_pretty_xml_fragment(
+                    etree_element, "  " * self.DEPTH, "  ", self.cdata_tags
+                )
+            )
+            self.converted += 1
+        # keep a reference to element so its id is not reused
+        self._names[id(element)] = (element, name)
+        return name
+
+
+class BuildManifest(object):
+    """
+    A record of the inputs each output xml file was last written from, used to skip
+    rewriting files whose inputs have not changed.
+
+    ApplicationFactory hashes the inputs of each file it writes (the template, the
+    placeholder row, each copy's substitution row and the builder settings) and checks
+    the hash against the manifest first. A file is skipped if its hash is unchanged and
+    the file still exists, so rerunning the factory after editing one row only rewrites
+    the file holding that row.
+
+    Example:
+
+        manifest = BuildManifest("output/build_manifest.json")
+        app_factory = ApplicationFactory(..., manifest=manifest)
+        app_factory.make_document(max_items_per_file=500)
+        manifest.skipped
+        ['output/VAV_1.xml', 'output/VAV_3.xml']
+        manifest.written
+        ['output/VAV_2.xml']
+
+    The manifest is saved to manifest_file by make_document. A manifest without a
+    manifest_file is kept in memory only.
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_file=None, files=None):
+        self.manifest_file = manifest_file
+        # {resolved output file path: inputs hash}
+        self.files = {} if files is None else dict(files)
+        if files is None and manifest_file is not None:
+            self.load()
+        # (output_file, inputs hash, skipped) for each file checked since loading
+        self.records = []
+
+    @property
+    def skipped(self):
+        return [output_file for output_file, _, skipped in self.records if skipped]
+
+    @property
+    def written(self):
+        return [output_file for output_file, _, skipped in self.records if not skipped]
+
+    def load(self):
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get("version") == self.VERSION:
+            self.files = manifest.get("files", {})
+
+    def get_key(self, output_file):
+        return os.path.abspath(output_file)
+
+    def is_current(self, output_file, inputs_hash):
+        """
+        returns True if output_file exists and was last written from inputs with the
+        same hash.
+        """
+        return self.files.get(
+            self.get_key(output_file)
+        ) == inputs_hash and os.path.exists(output_file)
+
+    def record(self, output_file, inputs_hash, skipped=False):
+        self.files[self.get_key(output_file)] = inputs_hash
+        self.records.append((output_file, inputs_hash, skipped))
+
+    def save(self):
+        if self.manifest_file is None:
+            return
+        manifest_dir = os.path.dirname(self.manifest_file)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        # write to a temporary file first so a crash never leaves a partial manifest
+        temp_file = self.manifest_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "files": self.files}, f, indent=1)
+        os.replace(temp_file, self.manifest_file)
+
+
+class RenderedCopyCache(object):
+    """
+    An on disk cache of rendered copies, keyed by (template hash, substitution tuple).
+
+    ApplicationFactory renders each copy of a template element, parses it and lays it out
+    as a pretty-printed xml fragment, which is the expensive part of making a copy. With
+    a RenderedCopyCache, the fragment is stored in a sqlite database at cache_file, so
+    any later run that makes the same copy of the same template (eg with a different
+    max_items_per_file, folder grouping or sheet batching) reuses the fragment instead
+    of rendering it again.
+
+    The cache holds at most max_bytes of fragments. When it grows past max_bytes, the
+    least recently used fragments are evicted.
+
+    Example:
+
+        copy_cache = RenderedCopyCache(".ebo_app_factory_cache/copies.sqlite")
+        app_factory = ApplicationFactory(..., copy_cache=copy_cache)
+        app_factory.make_document(max_items_per_file=500)
+        (copy_cache.hits, copy_cache.misses)
+        (0, 2000)
+        # the same copies in folders, on this or any later run
+        app_factory = ApplicationFactory(..., copy_cache=copy_cache)
+        app_factory.make_copies_in_folders("{{level}}")
+        app_factory.make_document()
+        (copy_cache.hits, copy_cache.misses)
+        (2000, 2000)
+    """
+
+    # pending writes are committed in batches of this many fragments
+    BATCH_SIZE = 1000
+
+    def __init__(self, cache_file, max_bytes=1024**3):
+        self.cache_file = cache_file
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pending = {}
+        self._used = set()
+
+    def __getstate__(self):
+        # sent to worker processes without the connection, each process opens its own
+        state = self.__dict__.copy()
+        state.update(_connection=None, _pending={}, _used=set(), hits=0, misses=0)
+        return state
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            cache_dir = os.path.dirname(self.cache_file)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_file, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS copies ("
+                "key TEXT PRIMARY KEY, fragment TEXT, size INTEGER, last_used REAL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def get_template_hash(template_str, *layout):
+        """
+        returns the hash of a template element's xml string and anything else that
+        changes how its copies are laid out (eg the builder's CDATA_TAGS).
+        """
+        template_hash = hashlib.sha256(template_str.encode("utf-8"))
+        template_hash.update(json.dumps(layout, default=str).encode("utf-8"))
+        return template_hash.hexdigest()
+
+    @staticmethod
+    def get_key(template_hash, values, laid_out=True):
+        """
+        returns the cache key of the copy of a template made with the substitution values,
+        laid out as a pretty-printed fragment or, if not laid_out, as rendered.
+        """
+        key = json.dumps([template_hash, laid_out, list(values)], default=str)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        returns the cached fragment for key, or None.
+        """
+        fragment = self._pending.get(key)
+        if fragment is None:
+            row = self.connection.execute(
+                "SELECT fragment FROM copies WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                fragment = row[0]
+                self._used.add(key)
+        if fragment is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fragment
+
+    def put(self, key, fragment):
+        self._pending[key] = fragment
+        if len(self._pending) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        writes pending fragments and last used times to the cache file, then evicts the
+        least recently used fragments if the cache is larger than self.max_bytes.
+        """
+        if not self._pending and not self._used:
+            return
+        now = time.time()
+        with self.connection as connection:
+            connection.executemany(
+                "UPDATE copies SET last_used = ? WHERE key = ?",
+                ((now, key) for key in self._used),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO copies VALUES (?, ?, ?, ?)",
+                (
+                    (key, fragment, len(fragment), now)
+                    for key, fragment in self._pending.items()
+                ),
+            )
+        self._pending = {}
+        self._used = set()
+        self.evict()
+
+    def evict(self):
+        connection = self.connection
+        total = connection.execute("SELECT SUM(size) FROM copies").fetchone()[0] or 0
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        cursor = connection.execute("SELECT key, size FROM copies ORDER BY last_used")
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        cursor.close()
+        with connection:
+            connection.executemany("DELETE FROM copies WHERE key = ?", evicted)
+
+    def close(self):
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -6,9 +6,12 @@ The CDATA contains Base64-encoded, gzip-compressed data.
 
 import base64
 import gzip
+import logging
 import xml.etree.ElementTree as ET
 from typing import Optional
 
+from .reporting import report
+
 
 def extract_cdata_from_xml(xml_file_path: str) -> Optional[str]:
     """
@@ -29,14 +32,14 @@ def extract_cdata_from_xml(xml_file_path: str) -> Optional[str]:
         if filecontents is not None and filecontents.text:
             return filecontents.text.strip()
         else:
-            print("FileContents CDATA not found in XML")
+            report("FileContents CDATA not found in XML", level=logging.ERROR)
             return None
 
     except ET.ParseError as e:
-        print(f"Error parsing XML: {e}")
+        report(f"Error parsing XML: {e}", level=logging.ERROR)
         return None
     except FileNotFoundError:
-        print(f"File not found: {xml_file_path}")
+        report(f"File not found: {xml_file_path}", level=logging.ERROR)
         return None
 
 
@@ -52,14 +55,20 @@ def decode_and_decompress_cdata(cdata_content: str) -> Optional[str]:
     """
     try:
         # Step 1: Decode from Base64
-        print("Decoding Base64...")
+        report("Decoding Base64...", level=logging.DEBUG)
         compressed_data = base64.b64decode(cdata_content)
-        print(f"Base64 decoded. Compressed size: {len(compressed_data)} bytes")
+        report(
+            f"Base64 decoded. Compressed size: {len(compressed_data)} bytes",
+            level=logging.DEBUG,
+        )
 
         # Step 2: Decompress gzip
-        print("Decompressing gzip...")
+        report("Decompressing gzip...", level=logging.DEBUG)
         decompressed_data = gzip.decompress(compressed_data)
-        print(f"Gzip decompressed. Decompressed size: {len(decompressed_data)} bytes")
+        report(
+            f"Gzip decompressed. Decompressed size: {len(decompressed_data)} bytes",
+            level=logging.DEBUG,
+        )
 
         # Step 3: Convert to string (assuming UTF-8 encoding)
         content = decompressed_data.decode("utf-8")
@@ -74,16 +83,16 @@ def decode_and_decompress_cdata(cdata_content: str) -> Optional[str]:
         return content
 
     except base64.binascii.Error as e:
-        print(f"Base64 decode error: {e}")
+        report(f"Base64 decode error: {e}", level=logging.ERROR)
         return None
     except gzip.BadGzipFile as e:
-        print(f"Gzip decompression error: {e}")
+        report(f"Gzip decompression error: {e}", level=logging.ERROR)
         return None
     except UnicodeDecodeError as e:
-        print(f"UTF-8 decode error: {e}")
+        report(f"UTF-8 decode error: {e}", level=logging.ERROR)
         return None
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        report(f"Unexpected error: {e}", level=logging.ERROR)
         return None
 
 
@@ -100,30 +109,33 @@ def extract_and_decode_xml_file(
     Returns:
         Optional[str]: Decompressed content, or None if error
     """
-    print(f"Processing XML file: {xml_file_path}")
+    report(f"Processing XML file: {xml_file_path}", level=logging.DEBUG)
 
     # Step 1: Extract CDATA from XML
     cdata_content = extract_cdata_from_xml(xml_file_path)
     if not cdata_content:
         return None
 
-    print(f"CDATA extracted. Base64 length: {len(cdata_content)} characters")
+    report(
+        f"CDATA extracted. Base64 length: {len(cdata_content)} characters",
+        level=logging.DEBUG,
+    )
 
     # Step 2: Decode and decompress
     decoded_content = decode_and_decompress_cdata(cdata_content)
     if not decoded_content:
         return None
 
-    print("Successfully decoded and decompressed content!")
+    report("Successfully decoded and decompressed content!", level=logging.DEBUG)
 
     # Step 3: Save to file if requested
     if output_file_path:
         try:
             with open(output_file_path, "w", encoding="utf-8") as f:
                 f.write(decoded_content)
-            print(f"Content saved to: {output_file_path}")
+            report(f"Content saved to: {output_file_path}", level=logging.DEBUG)
         except Exception as e:
-            print(f"Error saving file: {e}")
+            report(f"Error saving file: {e}", level=logging.ERROR)
 
     return decoded_content
 
@@ -141,7 +153,7 @@ def compress_and_encode_html(html_content: str) -> str:
     try:
         # Step 1: Convert string to bytes (UTF-8)
         html_bytes = html_content.encode("utf-8")
-        print(f"HTML content size: {len(html_bytes)} bytes")
+        report(f"HTML content size: {len(html_bytes)} bytes", level=logging.DEBUG)
 
         # Step 2: Compress with gzip
         compressed_data = gzip.compress(html_bytes)
@@ -149,20 +161,26 @@ def compress_and_encode_html(html_content: str) -> str:
         # Calculate compression ratio (handle empty content)
         if len(html_bytes) > 0:
             compression_ratio = len(compressed_data) / len(html_bytes)
-            print(
-                f"Compressed size: {len(compressed_data)} bytes (compression ratio: {compression_ratio:.2%})"
+            report(
+                f"Compressed size: {len(compressed_data)} bytes (compression ratio: {compression_ratio:.2%})",
+                level=logging.DEBUG,
             )
         else:
-            print(f"Compressed size: {len(compressed_data)} bytes (empty content)")
+            report(
+                f"Compressed size: {len(compressed_data)} bytes (empty content)",
+                level=logging.DEBUG,
+            )
 
         # Step 3: Encode to Base64
         base64_data = base64.b64encode(compressed_data).decode("ascii")
-        print(f"Base64 encoded size: {len(base64_data)} characters")
+        report(
+            f"Base64 encoded size: {len(base64_data)} characters", level=logging.DEBUG
+        )
 
         return base64_data
 
     except Exception as e:
-        print(f"Error compressing and encoding: {e}")
+        report(f"Error compressing and encoding: {e}", level=logging.ERROR)
         return None
 
 
@@ -215,14 +233,14 @@ def html_file_to_filecontents_element(html_file_path: str) -> ET.Element:
         with open(html_file_path, "r", encoding="utf-8") as f:
             html_content = f.read()
 
-        print(f"Read HTML file: {html_file_path}")
+        report(f"Read HTML file: {html_file_path}", level=logging.DEBUG)
         return create_filecontents_element(html_content)
 
     except FileNotFoundError:
-        print(f"HTML file not found: {html_file_path}")
+        report(f"HTML file not found: {html_file_path}", level=logging.ERROR)
         return None
     except Exception as e:
-        print(f"Error reading HTML file: {e}")
+        report(f"Error reading HTML file: {e}", level=logging.ERROR)
         return None
 
 
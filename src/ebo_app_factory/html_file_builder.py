@@ -70,6 +70,9 @@ class EBOHTMLFileBuilder(EBOXMLBuilder):
         )
     """
 
+    # compressed HTML file contents are written as CDATA sections
+    CDATA_TAGS = ("FileContents",)
+
     def __init__(self, ebo_version="6.0.4.90", server_full_path="/Server 1"):
         super().__init__(ebo_version, server_full_path)
 
@@ -351,33 +354,6 @@ class EBOHTMLFileBuilder(EBOXMLBuilder):
 
         return html_obj, object_type
 
-    def to_pretty_xml(self):
-        """
-        Converts the XML object to a pretty-printed string with proper CDATA sections for FileContents.
-        Returns:
-            str: Pretty-printed XML string with CDATA-wrapped FileContents.
-        """
-        # Get the base XML string
-        xml_str = super().to_pretty_xml()
-
-        # Replace FileContents text with CDATA sections
-        # Pattern: <FileContents Size="xxx">base64content</FileContents>
-        # Replace with: <FileContents Size="xxx"><![CDATA[base64content]]></FileContents>
-        import re
-
-        def replace_filecontents(match):
-            size_attr = match.group(1)
-            content = match.group(2)
-            return (
-                f'<FileContents Size="{size_attr}"><![CDATA[{content}]]></FileContents>'
-            )
-
-        # Use regex to find and replace FileContents elements
-        pattern = r'<FileContents Size="(\d+)">([^<]*)</FileContents>'
-        xml_str = re.sub(pattern, replace_filecontents, xml_str)
-
-        return xml_str
-
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,129 @@
+import contextlib
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes, or None if it is not
+    available on this platform.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class Tracer(object):
+    """
+    Collects structured build events from ApplicationFactory and EBOXMLBuilder.
+
+    Pass a Tracer to ApplicationFactory(tracer=...) or ApplicationFactoryManager, or set
+    it on a builder (builder.tracer = tracer). Each event is a dict with an "event" name
+    and "time", the seconds since the tracer was made, and is passed to callback, or
+    kept in tracer.events if there is no callback:
+
+    - stage_start: {"stage": "make_copies", "rows": 500, ...}
+    - stage_end: {"stage": "make_copies", "seconds": 1.2, "timings": {...},
+      "peak_rss": 157286400}, where timings holds the seconds spent in the stage on
+      each kind of work: "substitution" (rendering copies), "parsing" and
+      "serialization". peak_rss is the peak resident set size of the process so far,
+      None where it is not available.
+    - progress: {"stage": "make_copies", "done": 20, "total": 500}, as rows or copies
+      are processed.
+    - file_written: {"file": "out_1.xml", "bytes": 1048576}
+
+    Stages can be nested, eg write_xml inside make_document, time spent inside a nested
+    stage is counted in the timings of both.
+
+    Example:
+
+        tracer = Tracer(callback=lambda event: print(json.dumps(event)))
+        app_factory = ApplicationFactory(..., tracer=tracer)
+        app_factory.make_document(max_items_per_file=500)
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.events = []
+        self.start_time = time.perf_counter()
+        # timings of the open stages, innermost last
+        self._stages = []
+
+    def emit(self, event, **fields):
+        fields["event"] = event
+        fields["time"] = time.perf_counter() - self.start_time
+        if self.callback is None:
+            self.events.append(fields)
+        else:
+            self.callback(fields)
+
+    @contextlib.contextmanager
+    def stage(self, stage, **fields):
+        """
+        Emits stage_start, runs the body of the with statement, then emits stage_end
+        with the time taken and the timings of the work done in the stage.
+        """
+        self.emit("stage_start", stage=stage, **fields)
+        timings = {}
+        self._stages.append((stage, timings))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stages.pop()
+            self.emit(
+                "stage_end",
+                stage=stage,
+                seconds=seconds,
+                timings=timings,
+                peak_rss=get_peak_rss(),
+                **fields,
+            )
+
+    @contextlib.contextmanager
+    def timer(self, kind):
+        """
+        Adds the time taken by the body of the with statement to the timings of kind
+        (eg "parsing") of each open stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            for _, timings in self._stages:
+                timings[kind] = timings.get(kind, 0.0) + seconds
+
+    def progress(self, done, total):
+        stage = self._stages[-1][0] if self._stages else None
+        self.emit("progress", stage=stage, done=done, total=total)
+
+    def file_written(self, file_path, size):
+        self.emit("file_written", file=file_path, bytes=size)
+
+
+def trace_stage(tracer, stage, **fields):
+    """
+    Returns tracer.stage(stage, **fields), or a context manager doing nothing if tracer
+    is None.
+    """
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.stage(stage, **fields)
+
+
+def trace_timer(tracer, kind):
+    """
+    Returns tracer.timer(kind), or a context manager doing nothing if tracer is None.
+    """
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.timer(kind)
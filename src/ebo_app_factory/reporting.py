@@ -0,0 +1,104 @@
+import logging
+import sys
+import time
+
+# messages are logged here when reporting is configured with use_logging=True
+logger = logging.getLogger("ebo_app_factory")
+
+# settings shared by every builder and utility module, see configure_reporting
+settings = {
+    "enabled": True,
+    "use_logging": False,
+    "min_interval": 0.5,
+    "min_percent": 1,
+}
+
+
+def configure_reporting(
+    enabled=None, use_logging=None, min_interval=None, min_percent=None
+):
+    """
+    Configures the status messages and progress reported by every builder and utility
+    module. Arguments left as None are unchanged.
+
+    - enabled: set to False to turn all reporting off, nothing is printed or logged.
+    - use_logging: set to True to send messages to the "ebo_app_factory" logger instead
+      of printing them. Progress is logged at INFO level, detail (eg the compressed
+      size of each HTML file) at DEBUG level.
+    - min_interval, min_percent: progress is reported at most every min_interval
+      seconds, and only when it has moved on by at least min_percent percent.
+
+    Example:
+
+        from ebo_app_factory.reporting import configure_reporting
+
+        configure_reporting(enabled=False)  # eg in CI
+        configure_reporting(use_logging=True, min_interval=5)
+    """
+    for name, value in (
+        ("enabled", enabled),
+        ("use_logging", use_logging),
+        ("min_interval", min_interval),
+        ("min_percent", min_percent),
+    ):
+        if value is not None:
+            settings[name] = value
+
+
+def report(message, level=logging.INFO):
+    """
+    Reports a status message: printed if level is INFO or above, or logged at level if
+    reporting uses logging. Nothing is reported if reporting is turned off.
+    """
+    if not settings["enabled"]:
+        return
+    if settings["use_logging"]:
+        logger.log(level, message.strip())
+    elif level >= logging.INFO:
+        print(message)
+
+
+class ProgressReporter(object):
+    """
+    Reports the progress of a loop as a percentage, rate limited by the min_interval and
+    min_percent settings of configure_reporting, so a loop over many rows writes and
+    flushes stdout a handful of times instead of once per row.
+
+    Progress is written as "\\r42%" on stdout, or logged as "42%" if reporting uses
+    logging. Completion (100%) is always reported. A new loop starts whenever progress
+    goes backwards, eg when the same reporter is used for the next document.
+
+        progress_reporter = ProgressReporter()
+        for step, row in enumerate(rows, 1):
+            ...
+            progress_reporter.update(step, len(rows))
+    """
+
+    def __init__(self):
+        self.last_done = None
+        self.last_percent = None
+        self.last_time = None
+
+    def update(self, done, total):
+        if not settings["enabled"] or not total:
+            return
+        if self.last_done is not None and done < self.last_done:
+            # a new loop
+            self.last_percent = None
+        self.last_done = done
+        percent = int(done / total * 100)
+        now = time.monotonic()
+        if done < total and self.last_percent is not None:
+            if percent - self.last_percent < settings["min_percent"]:
+                return
+            if now - self.last_time < settings["min_interval"]:
+                return
+        if percent == self.last_percent:
+            return
+        self.last_percent = percent
+        self.last_time = now
+        if settings["use_logging"]:
+            logger.info("%d%%", percent)
+        else:
+            sys.stdout.write("\r%d%%" % percent)
+            sys.stdout.flush()
@@ -0,0 +1,378 @@
+import bisect
+import re
+
+from .xmlutils import iter_mustache_tags
+
+# bare ampersands in replacement values must be escaped before the copy is parsed as xml
+AMPERSAND_PATTERN = re.compile(r"&(?!(?:amp|lt|gt|apos|quot);)")
+
+
+def escape_ampersands(value):
+    """
+    Escapes any ampersand in value that is not already part of an xml entity.
+
+    Parameters:
+    - value (str): The replacement string.
+
+    Returns:
+    - str: The replacement string, safe to insert into serialized xml.
+    """
+    if "&" not in value:
+        return value
+    return AMPERSAND_PATTERN.sub("&amp;", value)
+
+
+def prepare_values(values):
+    """
+    Converts a sequence of raw replacement values (eg spreadsheet cell values) to
+    escaped strings. None values are kept as None, they mark placeholders that are
+    not replaced for this copy.
+    """
+    return [
+        None if value is None else escape_ampersands(str(value)) for value in values
+    ]
+
+
+class AhoCorasickMatcher(object):
+    """
+    An Aho-Corasick automaton of a list of placeholder substrings, built once, that
+    finds every occurrence of every placeholder in a text in a single scan, however
+    many placeholders there are. None placeholders are never matched.
+
+    Example:
+
+        matcher = AhoCorasickMatcher(["VAV-L21-INT4", "L21-INT4"])
+        matcher.find_all("VAV-L21-INT4")
+        [(0, 0), (4, 1)]
+    """
+
+    def __init__(self, placeholders):
+        self.placeholders = list(placeholders)
+        # per state: {character: next state}, fallback state and matched placeholders
+        self.transitions = [{}]
+        self.fallbacks = [0]
+        self.outputs = [[]]
+        for index, placeholder in enumerate(self.placeholders):
+            if placeholder:
+                self.add_placeholder(index, placeholder)
+        self.build_fallbacks()
+
+    def add_placeholder(self, index, placeholder):
+        state = 0
+        for character in placeholder:
+            next_state = self.transitions[state].get(character)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.fallbacks.append(0)
+                self.outputs.append([])
+                self.transitions[state][character] = next_state
+            state = next_state
+        self.outputs[state].append(index)
+
+    def build_fallbacks(self):
+        # breadth first, so the fallback of a state is always complete before its children
+        queue = list(self.transitions[0].values())
+        for state in queue:
+            for character, next_state in self.transitions[state].items():
+                fallback = self.fallbacks[state]
+                while fallback and character not in self.transitions[fallback]:
+                    fallback = self.fallbacks[fallback]
+                fallback = self.transitions[fallback].get(character, 0)
+                self.fallbacks[next_state] = fallback
+                self.outputs[next_state] = (
+                    self.outputs[next_state] + self.outputs[fallback]
+                )
+                queue.append(next_state)
+
+    def find_all(self, text):
+        """
+        returns a (start, placeholder index) tuple for every occurrence of every
+        placeholder in text, including overlapping occurrences, ordered by end position.
+        """
+        transitions = self.transitions
+        fallbacks = self.fallbacks
+        outputs = self.outputs
+        placeholders = self.placeholders
+        occurrences = []
+        state = 0
+        for position, character in enumerate(text):
+            while state and character not in transitions[state]:
+                state = fallbacks[state]
+            state = transitions[state].get(character, 0)
+            for index in outputs[state]:
+                occurrences.append((position + 1 - len(placeholders[index]), index))
+        return occurrences
+
+
+def select_sequential(occurrences, placeholders, active):
+    """
+    returns the (start, placeholder index) occurrences replaced when the active
+    placeholders are replaced in column order, each one in the text left over by the
+    placeholders before it, as with chained str.replace calls. Sorted by start.
+    """
+    starts_by_placeholder = {}
+    for start, index in sorted(occurrences):
+        if active[index]:
+            starts_by_placeholder.setdefault(index, []).append(start)
+    selected = []
+    # starts and ends of the occurrences selected so far, sorted, never overlapping
+    selected_starts = []
+    selected_ends = []
+    for index in sorted(starts_by_placeholder):
+        length = len(placeholders[index])
+        last_end = 0
+        for start in starts_by_placeholder[index]:
+            end = start + length
+            if start < last_end:
+                continue
+            position = bisect.bisect_left(selected_starts, end)
+            # only the last occurrence starting before this one ends can overlap it
+            if position and selected_ends[position - 1] > start:
+                continue
+            selected_starts.insert(position, start)
+            selected_ends.insert(position, end)
+            selected.append((start, index))
+            last_end = end
+    return sorted(selected)
+
+
+def select_longest(occurrences, placeholders, active):
+    """
+    returns the (start, placeholder index) occurrences replaced when, scanning left to
+    right, the longest active placeholder starting at each position wins (the first
+    column on a tie) and matches never overlap. Sorted by start.
+    """
+    selected = []
+    last_end = 0
+    for start, index in sorted(
+        occurrences,
+        key=lambda match: (match[0], -len(placeholders[match[1]]), match[1]),
+    ):
+        if active[index] and start >= last_end:
+            selected.append((start, index))
+            last_end = start + len(placeholders[index])
+    return selected
+
+
+class CompiledTemplate(object):
+    """
+    A template string compiled against an ordered list of placeholder substrings.
+
+    The template is split once into literal segments and placeholder slots, then each
+    copy is rendered by joining the literal segments with that copy's replacement values.
+    This replaces the old approach of running one str.replace per placeholder over the
+    whole template for every copy.
+
+    Placeholders are matched in list (spreadsheet column) order: the first placeholder
+    claims all of its occurrences in the template, the second placeholder claims its
+    occurrences in the text that is left over, and so on. This is the same precedence
+    as chaining str.replace calls, except that a replacement value is never rescanned
+    for a later placeholder.
+
+    Example:
+
+        compiled = CompiledTemplate(
+            '<OI NAME="VAV-L21-INT4"><PI Value="../L21-INT4/Zn"/></OI>',
+            ["VAV-L21-INT4", "L21-INT4"],
+        )
+        compiled.render(["VAV-L04-INT09", "L04_INT09"])
+        '<OI NAME="VAV-L04-INT09"><PI Value="../L04_INT09/Zn"/></OI>'
+
+    A replacement value of None leaves that placeholder in place, so later placeholders
+    may still match inside it, exactly as if its str.replace had been skipped. A plan is
+    compiled and cached for each distinct combination of None values.
+
+    By default the template is scanned once per placeholder when a plan is compiled.
+    Set matching to use an AhoCorasickMatcher instead, which finds every placeholder in
+    a single scan of the template, whatever the number of columns:
+
+    - "sequential": the same column order precedence as the default.
+    - "longest": the longest placeholder wins wherever placeholders overlap, whatever
+      its column, eg "VAV-L21-INT4" is replaced as a whole even if "L21-INT4" is in an
+      earlier column.
+
+    Or, for templates following the mustache convention, set matching to "mustache":
+    the template is split into literal text and whole {{tag}} placeholders (see
+    iter_mustache_tags) and each tag is filled from the first column whose placeholder
+    is that "{{tag}}". Nothing else is matched, so a placeholder is never found inside
+    other text, and tags with no column are left as they are.
+
+    Many copies are rendered in one call with render_rows, or render_batch for a block
+    of rows given as columns:
+
+        compiled.render_batch([["VAV-1", "VAV-2"], ["L1", "L2"]])
+        ['<OI NAME="VAV-1"><PI Value="../L1/Zn"/></OI>',
+         '<OI NAME="VAV-2"><PI Value="../L2/Zn"/></OI>']
+    """
+
+    MATCHING_MODES = (None, "sequential", "longest", "mustache")
+
+    def __init__(self, template_str, placeholders, matching=None):
+        if matching not in self.MATCHING_MODES:
+            raise ValueError(
+                f"matching must be one of {self.MATCHING_MODES}, not {matching!r}"
+            )
+        self.template_str = template_str
+        # empty header cells can never be matched
+        self.placeholders = [
+            None if placeholder is None or placeholder == "" else str(placeholder)
+            for placeholder in placeholders
+        ]
+        self.matching = matching
+        self._plans = {}
+        # every placeholder occurrence in the template, found on first use if matching
+        # is set, see get_occurrences
+        self._occurrences = None
+
+    def get_plan(self, active):
+        """
+        returns the format string used to render copies where only the placeholders
+        flagged True in active are replaced.
+        Literal text has its braces escaped and each slot is a positional field {i},
+        where i is the index of the placeholder in self.placeholders.
+        """
+        plan = self._plans.get(active)
+        if plan is None:
+            segments = self.split_template(active)
+            plan = "".join(
+                (
+                    "{%d}" % segment
+                    if isinstance(segment, int)
+                    else segment.replace("{", "{{").replace("}", "}}")
+                )
+                for segment in segments
+            )
+            self._plans[active] = plan
+        return plan
+
+    def split_template(self, active):
+        """
+        returns the template as a list of literal strings and placeholder slot indexes,
+        matching the active placeholders in column order.
+        """
+        if self.matching is not None:
+            return self.split_template_with_matcher(active)
+        segments = [self.template_str]
+        for index, placeholder in enumerate(self.placeholders):
+            if placeholder is None or not active[index]:
+                continue
+            split_segments = []
+            for segment in segments:
+                if isinstance(segment, int) or placeholder not in segment:
+                    split_segments.append(segment)
+                    continue
+                parts = segment.split(placeholder)
+                split_segments.append(parts[0])
+                for part in parts[1:]:
+                    split_segments.append(index)
+                    split_segments.append(part)
+            segments = split_segments
+        return segments
+
+    def get_occurrences(self):
+        """
+        returns the (start, placeholder index) of every placeholder occurrence in the
+        template, found in a single scan the first time it is called: by an
+        AhoCorasickMatcher, or for "mustache" matching the {{tag}} placeholders that
+        have a column, each with the index of the first such column.
+        """
+        if self._occurrences is None:
+            if self.matching == "mustache":
+                columns = {}
+                for index, placeholder in enumerate(self.placeholders):
+                    if placeholder is not None:
+                        columns.setdefault(placeholder, index)
+                self._occurrences = [
+                    (start, columns[self.template_str[start:end]])
+                    for start, end, _ in iter_mustache_tags(self.template_str)
+                    if self.template_str[start:end] in columns
+                ]
+            else:
+                matcher = AhoCorasickMatcher(self.placeholders)
+                self._occurrences = matcher.find_all(self.template_str)
+        return self._occurrences
+
+    def split_template_with_matcher(self, active):
+        """
+        split_template for a matching mode: the template is scanned once for every
+        placeholder, then the occurrences are selected for active, in column order
+        ("sequential"), longest match first ("longest") or every {{tag}} ("mustache").
+        """
+        occurrences = self.get_occurrences()
+        if self.matching == "mustache":
+            selected = [(start, index) for start, index in occurrences if active[index]]
+        elif self.matching == "longest":
+            selected = select_longest(occurrences, self.placeholders, active)
+        else:
+            selected = select_sequential(occurrences, self.placeholders, active)
+        segments = []
+        position = 0
+        for start, index in selected:
+            segments.append(self.template_str[position:start])
+            segments.append(index)
+            position = start + len(self.placeholders[index])
+        segments.append(self.template_str[position:])
+        return segments
+
+    def render(self, values):
+        """
+        Renders one copy of the template.
+
+        Parameters:
+        - values (Sequence): Replacement values aligned with self.placeholders. None means
+          the placeholder is not replaced for this copy.
+
+        Returns:
+        - str: The rendered copy.
+        """
+        values = prepare_values(values)
+        active = tuple(value is not None for value in values)
+        return self.get_plan(active).format(*values)
+
+    def render_batch(self, columns, number_of_rows=None):
+        """
+        Renders a copy of the template for each row of a block of rows, given as
+        columns. Each column's values are converted and escaped in one pass, and when no
+        value is None every copy is rendered from the same plan by a single map over the
+        columns, without a Python level loop per row.
+
+        Parameters:
+        - columns (Sequence[Sequence]): One column of replacement values per placeholder,
+          aligned with self.placeholders, each holding one value per row. None means the
+          placeholder is not replaced for that row.
+        - number_of_rows (int): The number of rows, only needed if there are no columns.
+
+        Returns:
+        - List[str]: The rendered copies, in row order.
+        """
+        columns = [prepare_values(column) for column in columns]
+        if number_of_rows is None:
+            number_of_rows = len(columns[0]) if columns else 0
+        if any(len(column) != number_of_rows for column in columns):
+            raise ValueError("All columns must have one value per row")
+        if number_of_rows == 0:
+            return []
+        if not columns:
+            return [self.get_plan(()).format()] * number_of_rows
+        if not any(None in column for column in columns):
+            plan = self.get_plan((True,) * len(columns))
+            return list(map(plan.format, *columns))
+        return [
+            self.get_plan(tuple(value is not None for value in values)).format(*values)
+            for values in zip(*columns)
+        ]
+
+    def render_rows(self, rows):
+        """
+        Renders a copy of the template for each row of replacement values, see
+        render_batch.
+
+        Parameters:
+        - rows (Sequence[Sequence]): Rows of replacement values, each aligned with
+          self.placeholders as for render.
+
+        Returns:
+        - List[str]: The rendered copies, in row order.
+        """
+        return self.render_batch(list(zip(*rows)), number_of_rows=len(rows))
@@ -1,16 +1,35 @@
 import xml
 import openpyxl
+from openpyxl.utils import get_column_letter
 from xml.dom import minidom
 import xml.etree.ElementTree as ET
-import sys
-import re
 import os
+import itertools
+import contextlib
+import csv
+import hashlib
+import json
+import logging
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 
 from ebo_app_factory.ebo_xml_builder import EBOXMLBuilder
+from .factory_cache import BuildManifest, ObjectTypeCache, TemplateCache
+from .instrumentation import trace_stage, trace_timer
+from .reporting import ProgressReporter, report
+from .template_compiler import CompiledTemplate
 from .xmlutils import (
     convert_minidom_to_etree,
     extract_mustache_tags_from_xml,
     find_and_clean_folder_elements,
+    indent_xml_fragment,
+    load_template_child_elements_dict,
+    parse_xml_fragment,
+    RawXMLElement,
+    read_template_child_spans,
+    TemplateIndex,
+    to_pretty_xml_fragment,
+    to_xml_string,
 )
 
 # <?xml version="1.0" encoding="UTF-8"?>
@@ -34,7 +53,7 @@ from .xmlutils import (
 
 class ApplicationTemplate(object):
 
-    def __init__(self, xml_in_file, print_result=False):
+    def __init__(self, xml_in_file, print_result=False, streaming=False, raw=False):
         """
         creates a dictionary of lists of child DOM Elements from the template xml file
         where each key represents the tagname of each eleemnt that should live in the root element of the DOM
@@ -43,16 +62,42 @@ class ApplicationTemplate(object):
                 'Types': [<DOM Element: ObjectType at 0x7f5665bec700>, <DOM Element: ObjectType at 0x7f5665adef70>],
                 'ExportedObjects': [<DOM Element: OI at 0x7f5665afe430>]
         }
+
+        For very large exports, set streaming to True: the file is streamed with
+        ET.iterparse instead of parsed with minidom, only the Types and ExportedObjects
+        children are kept, as compact ElementTree Elements, and everything else is freed
+        as it is read. xml_in_doc is then None, so the minidom helper methods are not
+        available.
+
+        Set raw to True to skip parsing altogether: the byte offsets of the Types and
+        ExportedObjects children are recorded in template_spans and their exact xml text
+        is read from the file (memory-mapped if it is large), see
+        read_template_child_spans. xml_in_doc is None here too.
         """
-        self.xml_in_doc = minidom.parse(xml_in_file)
         # list of nodes to export children
         self.template_nodes = ["Types", "ExportedObjects"]
-        self.template_child_elements_dict = self.get_template_child_elements_dict()
+        # byte offsets of the template children in xml_in_file, only set if raw
+        self.template_spans = None
+        if raw:
+            self.xml_in_doc = None
+            (self.template_spans, self.template_child_elements_dict) = (
+                read_template_child_spans(xml_in_file, self.template_nodes)
+            )
+        elif streaming:
+            self.xml_in_doc = None
+            self.template_child_elements_dict = load_template_child_elements_dict(
+                xml_in_file, self.template_nodes
+            )
+        else:
+            self.xml_in_doc = minidom.parse(xml_in_file)
+            self.template_child_elements_dict = self.get_template_child_elements_dict()
+        # lookup tables of the template's objects, see get_index
+        self._index = None
         if print_result:
             for key, value in self.template_child_elements_dict.items():
                 for element in value:
                     print(key, value)
-                    print(element.toxml())
+                    print(to_xml_string(element))
 
     def get_child_nodes_by_element_tagname(self, tagname, elements_only=False):
         """
@@ -93,10 +138,23 @@ class ApplicationTemplate(object):
             )
         return template_child_elements_dict
 
+    def get_index(self):
+        """
+        returns the TemplateIndex of the template's ExportedObjects, built on first use,
+        for looking up its objects by NAME, TYPE or path.
+        """
+        if self._index is None:
+            self._index = TemplateIndex(
+                self.template_child_elements_dict["ExportedObjects"]
+            )
+        return self._index
+
 
 class FactoryInputsFromSpreadsheet(object):
 
-    def __init__(self, xlfile=None, sheetname=None, print_result=False):
+    def __init__(
+        self, xlfile=None, sheetname=None, print_result=False, show_progress=True
+    ):
         """
         read in a spreadsheet containing a tables of:
         - app template placeholder substrings
@@ -105,6 +163,7 @@ class FactoryInputsFromSpreadsheet(object):
         each non empty cell of the first row of each sheet read is stored as a template placeholder substring key:value store
         each non empty second and subsequent row represents an app to be copied from the template, stored as a list of key:value stores,
         the cells of which correspond to replacement strings
+        Set show_progress to False to read the sheets without reporting, see reporting.report
 
         Example:
 
@@ -158,7 +217,7 @@ class FactoryInputsFromSpreadsheet(object):
 
         """
         self.xlfile = xlfile
-        self.show_progress = True
+        self.show_progress = show_progress
         self.create_factory_inputs_from_excel(sheetname=sheetname)
         if print_result:
             print(self.factory_placeholders)
@@ -173,10 +232,18 @@ class FactoryInputsFromSpreadsheet(object):
         self.factory_copy_substrings is a flattened list of copy substrings
         factory_copy_substrings_sorted is a dict of lists of copy substrings,
         where each key represents a sheet
+
+        The workbook is opened in read only mode and each sheet's rows are streamed as
+        values, see iter_xl_sheet_rows.
         """
 
-        workbook = openpyxl.load_workbook(self.xlfile, data_only=True)
+        workbook = openpyxl.load_workbook(self.xlfile, read_only=True, data_only=True)
+        try:
+            self.create_factory_inputs_from_workbook(workbook, sheetname=sheetname)
+        finally:
+            workbook.close()
 
+    def create_factory_inputs_from_workbook(self, workbook, sheetname=None):
         if sheetname == None:
             allsheetnames = workbook.sheetnames
             sheetnames = [s for s in allsheetnames if "meta" not in s]
@@ -191,7 +258,7 @@ class FactoryInputsFromSpreadsheet(object):
         self.factory_copy_substrings_sorted = {}
 
         if self.show_progress:
-            print("\nCreating factory inputs from:", sheetnames)
+            report(f"\nCreating factory inputs from: {sheetnames}")
 
         for sheetname in sheetnames:
             (placeholders, factory_copy_substrings) = (
@@ -203,27 +270,324 @@ class FactoryInputsFromSpreadsheet(object):
             self.factory_copy_substrings_sorted[sheetname] = factory_copy_substrings
 
     def create_factory_inputs_from_xl_sheet(self, sheetname, workbook):
+        return collect_factory_inputs(self.iter_xl_sheet_rows(sheetname, workbook))
 
+    def iter_xl_sheet_rows(self, sheetname, workbook):
+        """
+        yields a (keys, values) tuple for each row of the sheet, from the first row.
+        keys are the sheetname + column letter of each cell, eg 'Sheet1A', and are worked
+        out once per sheet rather than for every cell. Rows are read as values only, and
+        padded with None to the width of the sheet.
+        """
         sheet = workbook[sheetname]
-        placeholders = {}
-        factory_copy_substrings = []
-        for row in sheet.iter_rows():
-            factory_copy = {}
-            first_row = True
-            for cell in row:
-                key = sheetname + cell.column_letter
-                if cell.row == 1:
-                    placeholders[key] = cell.value
-                else:
-                    first_row = False
-                    factory_copy[key] = cell.value
-            if not first_row:
-                factory_copy_substrings.append(factory_copy)
-        return (placeholders, factory_copy_substrings)
+        width = sheet.max_column or 0
+        keys = [sheetname + get_column_letter(i + 1) for i in range(width)]
+        for values in sheet.iter_rows(values_only=True):
+            if len(values) > len(keys):
+                keys.extend(
+                    sheetname + get_column_letter(i + 1)
+                    for i in range(len(keys), len(values))
+                )
+            elif len(values) < len(keys):
+                values = values + (None,) * (len(keys) - len(values))
+            yield keys, values
+
+
+# file extensions read by FactoryInputsFromCsv from a directory
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt")
+
+
+class FactoryInputsFromCsv(object):
+
+    def __init__(
+        self,
+        csv_path=None,
+        sheetname=None,
+        delimiter=None,
+        print_result=False,
+        show_progress=True,
+    ):
+        """
+        read in delimited text files (eg CSV or TSV asset registers exported from a CMMS)
+        containing the same tables as FactoryInputsFromSpreadsheet, one file per group:
+        - app template placeholder substrings in the first row
+        - app copy replacement substrings in each subsequent row
+
+        csv_path is either a single file or a directory of files. Each file is a group,
+        named after the file without its extension, and plays the part of a workbook
+        sheet: keys are the group name + column letter, eg 'Sheet1A' for the first column
+        of 'Sheet1.csv', so a template_map written for a workbook works unchanged.
+        In a directory, files ending .csv, .tsv or .txt are read in name order, except
+        those with 'meta' in their name. To limit which files are read, set sheetname
+        to a group name or a list of group names.
+
+        delimiter defaults to a tab for .tsv files and a comma otherwise.
+        Empty cells are read as None, as empty spreadsheet cells are.
+        Set show_progress to False to read the files without reporting.
+
+        The same attributes as FactoryInputsFromSpreadsheet are created:
+        factory_placeholders, factory_placeholders_sorted, factory_copy_substrings and
+        factory_copy_substrings_sorted.
+        """
+        self.csv_path = csv_path
+        self.delimiter = delimiter
+        self.show_progress = show_progress
+        self.create_factory_inputs_from_csv(sheetname=sheetname)
+        if print_result:
+            print(self.factory_placeholders)
+            print(self.factory_copy_substrings)
+
+    def get_csv_files(self):
+        """
+        returns a dict of {group: file path} for self.csv_path
+        """
+        if not os.path.isdir(self.csv_path):
+            group = os.path.splitext(os.path.basename(self.csv_path))[0]
+            return {group: self.csv_path}
+        csv_files = {}
+        for filename in sorted(os.listdir(self.csv_path)):
+            group, extension = os.path.splitext(filename)
+            if extension.lower() in CSV_EXTENSIONS and "meta" not in group:
+                csv_files[group] = os.path.join(self.csv_path, filename)
+        return csv_files
+
+    def create_factory_inputs_from_csv(self, sheetname=None):
+        csv_files = self.get_csv_files()
+
+        if sheetname == None:
+            sheetnames = list(csv_files)
+        elif isinstance(sheetname, str):
+            sheetnames = [sheetname]
+        elif isinstance(sheetname, list):
+            sheetnames = sheetname
+
+        self.factory_placeholders = {}
+        self.factory_placeholders_sorted = {}
+        self.factory_copy_substrings = []
+        self.factory_copy_substrings_sorted = {}
+
+        if self.show_progress:
+            report(f"\nCreating factory inputs from: {sheetnames}")
+
+        for sheetname in sheetnames:
+            (placeholders, factory_copy_substrings) = collect_factory_inputs(
+                self.iter_csv_rows(sheetname, csv_files[sheetname])
+            )
+            self.factory_placeholders.update(placeholders)
+            self.factory_copy_substrings.extend(factory_copy_substrings)
+            self.factory_placeholders_sorted[sheetname] = placeholders
+            self.factory_copy_substrings_sorted[sheetname] = factory_copy_substrings
+
+    def iter_csv_rows(self, group, csv_file):
+        """
+        yields a (keys, values) tuple for each row of the file, streamed with csv.reader.
+        Rows are padded with None to the widest row seen so far.
+        """
+        delimiter = self.delimiter
+        if delimiter is None:
+            delimiter = "\t" if csv_file.lower().endswith(".tsv") else ","
+        keys = []
+        # utf-8-sig drops the byte order mark written by Excel and many CMMS exports
+        with open(csv_file, "r", newline="", encoding="utf-8-sig") as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                values = tuple(value if value != "" else None for value in row)
+                if len(values) > len(keys):
+                    keys.extend(
+                        group + get_column_letter(i + 1)
+                        for i in range(len(keys), len(values))
+                    )
+                elif len(values) < len(keys):
+                    values = values + (None,) * (len(keys) - len(values))
+                yield keys, values
+
+
+class FactoryRow(Mapping):
+    """
+    The copy substrings of one copy: a read only mapping of key (sheetname + column
+    letter) to cell value, backed by a tuple of the row's values and a {key: position}
+    index shared by every row of the sheet.
+
+    Each row costs one tuple instead of a dict repeating every key, and the same row
+    objects are shared by factory_copy_substrings and factory_copy_substrings_sorted.
+    Rows behave like the dicts they replace for reading, and compare equal to them:
+
+        row = FactoryRow({'Sheet1A': 0, 'Sheet1B': 1}, ('VAV-2', 'Zn2'))
+        row['Sheet1A']
+        'VAV-2'
+        row == {'Sheet1A': 'VAV-2', 'Sheet1B': 'Zn2'}
+        True
+    """
+
+    # the values tuple is _values, so Mapping.values() still works
+    __slots__ = ("index", "_values")
+
+    def __init__(self, index, values):
+        self.index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self.index[key]]
+
+    def get(self, key, default=None):
+        position = self.index.get(key)
+        if position is None:
+            return default
+        return self._values[position]
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def collect_factory_inputs(rows):
+    """
+    returns (placeholders, factory_copy_substrings) from an iterable of (keys, values)
+    rows, where the first row holds the placeholders and each subsequent row holds the
+    copy substrings of one copy, as a FactoryRow.
+    """
+    placeholders = {}
+    factory_copy_substrings = []
+    rows = iter(rows)
+    for keys, values in rows:
+        # first row is the placeholders
+        placeholders = dict(zip(keys, values))
+        break
+    index = {}
+    for keys, values in rows:
+        if len(keys) != len(index):
+            # a new index only when the sheet gets wider, every other row shares it
+            index = {key: position for position, key in enumerate(keys)}
+        factory_copy_substrings.append(FactoryRow(index, tuple(values)))
+    return (placeholders, factory_copy_substrings)
+
+
+def index_copies_by_folder(factory_copy_substrings, folder_keys):
+    """
+    returns a folder index of the copy substrings rows, grouped by the value of each
+    folder key in turn, built in a single pass over the rows:
+
+        {
+            'size': 5,  # number of rows in the index
+            'copies': [],  # rows with an empty first folder cell
+            'folders': {
+                'B01': {'copies': [row, row], 'folders': {}},
+                'L00': {'copies': [row], 'folders': {'Zone 1': {...}}},
+            },
+        }
+
+    Folders are listed in the order their names first appear and rows keep their
+    spreadsheet order. A row is put in the deepest folder for which it has a value, so a
+    row with an empty cell for the second folder key is in its first level folder.
+    Rows without the first folder key (eg from another sheet) are left out.
+    """
+    folder_index = {"size": 0, "copies": [], "folders": {}}
+    if not folder_keys:
+        return folder_index
+    first_key = folder_keys[0]
+    for copy_substrings in factory_copy_substrings:
+        if first_key not in copy_substrings:
+            continue
+        node = folder_index
+        for key in folder_keys:
+            folder_name = copy_substrings.get(key)
+            if folder_name is None:
+                break
+            sub_node = node["folders"].get(folder_name)
+            if sub_node is None:
+                sub_node = {"copies": [], "folders": {}}
+                node["folders"][folder_name] = sub_node
+            node = sub_node
+        node["copies"].append(copy_substrings)
+        folder_index["size"] += 1
+    return folder_index
+
+
+def iter_chunks(items, chunk_size):
+    """
+    yields lists of up to chunk_size consecutive items from the iterable items, without
+    holding more than one chunk at a time.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_sized_chunks(items, max_bytes=None, max_items=None, get_size=len):
+    """
+    yields a (chunk, is_last) tuple for each list of consecutive items from the iterable
+    items. A new chunk is started before the bytes of a chunk, the sum of get_size(item)
+    of its items, would exceed max_bytes, or when it holds max_items items. A single
+    item larger than max_bytes is a chunk of its own.
+    Items are sized as they are read, only one chunk is held at a time. is_last is True
+    for the last chunk, which is an empty list if there are no items.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for item in items:
+        size = get_size(item)
+        if chunk and (
+            (max_items is not None and len(chunk) >= max_items)
+            or (max_bytes is not None and chunk_bytes + size > max_bytes)
+        ):
+            yield chunk, False
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(item)
+        chunk_bytes += size
+    yield chunk, True
+
+
+def split_sizes_evenly(sizes, number_of_chunks):
+    """
+    returns the lengths of up to number_of_chunks chunks of consecutive items with about
+    the same total size, given the size of each item. Each item goes in the chunk its
+    midpoint falls in when the total size is split evenly, so there are fewer chunks
+    only when there are fewer items or some items are very large.
+
+        split_sizes_evenly([10, 10, 10, 30], 2)
+        [3, 1]
+    """
+    if number_of_chunks < 1:
+        raise ValueError("number_of_chunks must be at least 1")
+    total = sum(sizes)
+    if total == 0:
+        return [len(sizes)]
+    chunk_lengths = [0] * number_of_chunks
+    position = 0
+    for size in sizes:
+        chunk_index = min(
+            number_of_chunks - 1,
+            int((position + size / 2) * number_of_chunks // total),
+        )
+        chunk_lengths[chunk_index] += 1
+        position += size
+    return [length for length in chunk_lengths if length]
+
+
+def get_fragment_size(element, depth):
+    """
+    returns the number of bytes (utf-8) a RawXMLElement takes in a document when written
+    at depth, including its indent and newline.
+    """
+    return len(element.raw_xml.encode("utf-8")) + len("  " * depth) + 1
 
 
 class ApplicationFactory(object):
 
+    # rows rendered together by make_copy_batch in make_copies
+    BATCH_SIZE = 500
+
     def __init__(
         self,
         template_child_elements_dict=None,
@@ -234,27 +598,62 @@ class ApplicationFactory(object):
         ebo_server_full_path="/EBOApplicationFactory_v0.1",
         ebo_export_mode="Special",
         show_progress=True,
+        validate_copies=True,
+        workers=None,
+        manifest=None,
+        copy_cache=None,
+        type_cache=None,
+        tracer=None,
+        placeholder_matching=None,
     ):
         self.show_progress = show_progress
         self.xml_out_file = xml_out_file
         self.template_child_elements_dict = template_child_elements_dict
         self.factory_placeholders = factory_placeholders
         self.factory_copy_substrings = factory_copy_substrings
+        # parse each copy to check it is well formed xml, otherwise copies are written
+        # to the document as rendered text without being parsed
+        self.validate_copies = validate_copies
+        # None, "sequential", "longest" or "mustache", see CompiledTemplate
+        self.placeholder_matching = placeholder_matching
+        # number of worker processes used to make copies, None or 1 makes copies in this process
+        self.workers = workers
+        # worker processes shared by the batches of copies of make_document
+        self.copy_executor = None
+        # pass a BuildManifest to only rewrite files whose inputs have changed
+        self.manifest = manifest
+        # pass a RenderedCopyCache to reuse copies rendered by this or earlier runs
+        self.copy_cache = copy_cache
         self.xml_builder = EBOXMLBuilder(
             ebo_version=ebo_version,
             server_full_path=ebo_server_full_path,
             export_mode=ebo_export_mode,
         )
+        # pass an ObjectTypeCache to share converted Types with other factories
+        if type_cache is None:
+            type_cache = ObjectTypeCache(self.xml_builder.CDATA_TAGS)
+        self.type_cache = type_cache
+        # pass an instrumentation.Tracer to receive build events, see Tracer
+        self.tracer = tracer
+        self.xml_builder.tracer = tracer
+        self.progress_reporter = ProgressReporter()
 
     def stdout_progress(self, step, total_steps):
+        if self.tracer is not None:
+            self.tracer.progress(step, total_steps)
         if self.show_progress:
-            sys.stdout.write("\r")
-            sys.stdout.write("%d%%" % (step / total_steps * 100))
-            sys.stdout.flush()
+            # rate limited, see ProgressReporter
+            self.progress_reporter.update(step, total_steps)
         return step + 1
 
     def make_document(
-        self, write_result=True, print_result=False, max_items_per_file=None
+        self,
+        write_result=True,
+        print_result=False,
+        max_items_per_file=None,
+        folder_placeholder=None,
+        max_bytes_per_file=None,
+        number_of_files=None,
     ):
         """
         The xml document is constructed as follows:
@@ -267,92 +666,294 @@ class ApplicationFactory(object):
                         {{ self.factory_copies_dict['ExportedObjects'] }}
                 </ExportedObjects>
         </ObjectSet>
+
+        If the copies have not already been made by make_copies or make_copies_in_folders,
+        the document is made as a pipeline: copy substrings rows -> copies -> chunks of
+        max_items_per_file copies -> files. The copies of each file are made just before
+        the file is written and released after, so only one file's copies are held in
+        memory at a time. Pass folder_placeholder to group the copies in folders as
+        make_copies_in_folders does. With self.workers, the copies are made in worker
+        processes BATCH_SIZE copies at a time, see iter_document_elements.
+
+        The ExportedObjects can also be split by size, measured from the pretty-printed
+        copies as they are made, see iter_sized_document_chunks:
+        - max_bytes_per_file starts a new file before the ExportedObjects of a file would
+          exceed max_bytes_per_file bytes (a single copy larger than this gets a file of
+          its own). It can be combined with max_items_per_file, whichever limit is
+          reached first starts a new file.
+        - number_of_files splits the ExportedObjects into that many files of about the
+          same size. The copies are sized in a first pass then made again file by file,
+          pass a copy_cache to render each copy only once.
+        The header and Types are not counted in the file size.
         """
-        # check if factory copies has already been created
-        if not hasattr(self, "factory_copies_dict"):
-            self.make_copies()
-        # report progress
-        if self.show_progress:
-            print("\nCreating document...")
-        size = 0
-        for node in self.factory_copies_dict:
-            size += len(self.factory_copies_dict[node])
-        progress = 1
-        for item in self.factory_copies_dict["Types"]:
-            # Convert minidom Element to ElementTree Element
-            etree_element = convert_minidom_to_etree(item)
-            self.xml_builder.add_object_type(etree_element)
+        with trace_stage(self.tracer, "make_document", file=self.xml_out_file):
+            if number_of_files is not None and (
+                max_items_per_file is not None or max_bytes_per_file is not None
+            ):
+                raise ValueError(
+                    "number_of_files cannot be combined with max_items_per_file or "
+                    "max_bytes_per_file"
+                )
+            types = self.template_child_elements_dict.get("Types", [])
+            # copy plan jobs of the copies already made, for the manifest hash
+            premade_plan = None
+            # check if factory copies has already been created
+            if hasattr(self, "factory_copies_dict"):
+                types = self.factory_copies_dict["Types"]
+                exported_objects = self.factory_copies_dict["ExportedObjects"]
+                total_items = len(exported_objects)
+                premade_plan = self.factory_copies_plan
+            elif folder_placeholder is not None:
+                self.make_copies_in_folders(folder_placeholder, defer_copies=True)
+                exported_objects = self.copy_plan
+                total_items = len(exported_objects)
+            elif hasattr(self, "copy_plan"):
+                exported_objects = self.copy_plan
+                total_items = len(exported_objects)
+            else:
+                # copies are made one file at a time from the copy plan
+                exported_objects = self.iter_copy_plan()
+                total_items = len(self.factory_copy_substrings) * len(
+                    self.template_child_elements_dict.get("ExportedObjects", [])
+                )
+            # report progress
+            if self.show_progress:
+                report("\nCreating document...")
+            size = len(types) + total_items
+            self._document_progress = (1, size)
+            # Set Types once (they don't change per file), converted and serialized once
+            # and without duplicate Names, see ObjectTypeCache
+            self.xml_builder.set_object_types(self.type_cache.get_object_types(types))
+            self.report_document_progress(len(types))
+
+            # Split ExportedObjects into chunks, each chunk is written to a file
+            if max_bytes_per_file is not None:
+                chunks = self.iter_sized_document_chunks(
+                    exported_objects, max_bytes_per_file, max_items_per_file
+                )
+            elif number_of_files is not None:
+                chunks = self.iter_balanced_document_chunks(
+                    exported_objects, number_of_files
+                )
+            elif max_items_per_file is None or max_items_per_file >= total_items:
+                # Single file case
+                chunks = [(list(exported_objects), None, True)]
+            else:
+                # Multiple files case - split into chunks
+                file_count = -(-total_items // max_items_per_file)
+                chunks = (
+                    (chunk, None, file_index + 1 == file_count)
+                    for file_index, chunk in enumerate(
+                        iter_chunks(exported_objects, max_items_per_file)
+                    )
+                )
 
-        number_of_files = calc_number_of_files_needed(
-            self.factory_copies_dict["ExportedObjects"], max_items_per_file
-        )
-        
-        # Add Types once (they don't change per file)
-        for item in self.factory_copies_dict["Types"]:
-            # Convert minidom Element to ElementTree Element
-            etree_element = convert_minidom_to_etree(item)
-            self.xml_builder.add_object_type(etree_element)
-        
-        # Split ExportedObjects into chunks based on max_items_per_file
-        exported_objects = self.factory_copies_dict["ExportedObjects"]
-        total_items = len(exported_objects)
-        
-        if max_items_per_file is None or max_items_per_file >= total_items:
-            # Single file case
-            chunks = [exported_objects]
-            file_count = 1
-        else:
-            # Multiple files case - split into chunks
-            chunks = []
-            for i in range(0, total_items, max_items_per_file):
-                chunk = exported_objects[i:i + max_items_per_file]
-                chunks.append(chunk)
-            file_count = len(chunks)
-        
-        # Process each chunk and write to separate files
-        for file_index, chunk in enumerate(chunks):
-            # Convert items to ElementTree elements
-            etree_elements = []
-            for item in chunk:
-                # Check if it's a minidom Element before converting
-                if isinstance(item, xml.dom.minidom.Element):
-                    etree_element = convert_minidom_to_etree(item)
-                elif isinstance(item, ET.Element):
-                    etree_element = item  # Already an ElementTree Element
-                else:
-                    # Handle other types or raise an error
-                    raise TypeError(f"Unexpected element type: {type(item)}")
-                etree_elements.append(etree_element)
-                # report progress
-                progress = self.stdout_progress(progress, size)
-            
-            # Set (replace) the exported objects for this file
-            self.xml_builder.set_exported_objects(etree_elements)
-            
-            if print_result:
-                print(self.xml_builder.to_pretty_xml())
-            
-            if write_result:
-                # Generate output filename
+            with self.copy_workers():
+                # Process each chunk and write to separate files
+                file_count = 0
+                # position of the chunk's first item in exported_objects
+                position = 0
+                for file_index, (chunk, etree_elements, is_last) in enumerate(chunks):
+                    file_count += 1
+                    chunk_plan = chunk
+                    if premade_plan is not None:
+                        chunk_plan = premade_plan[position : position + len(chunk)]
+                    position += len(chunk)
+                    if file_index == 0:
+                        multiple_files = not is_last
+                    output_file = None
+                    if write_result:
+                        # Generate output filename
+                        if multiple_files:
+                            # Multiple files: add suffix _1.xml, _2.xml, etc.
+                            # Remove .xml extension
+                            base_name = self.xml_out_file.rsplit(".", 1)[0]
+                            extension = (
+                                self.xml_out_file.rsplit(".", 1)[1]
+                                if "." in self.xml_out_file
+                                else "xml"
+                            )
+                            output_file = f"{base_name}_{file_index + 1}.{extension}"
+                        else:
+                            # Single file: use original filename
+                            output_file = self.xml_out_file
+
+                    if self.manifest is not None and output_file is not None:
+                        inputs_hash = self.get_inputs_hash(chunk_plan)
+                        if self.manifest.is_current(output_file, inputs_hash):
+                            self.manifest.record(output_file, inputs_hash, skipped=True)
+                            if self.show_progress:
+                                report(f'\nSkipping unchanged document "{output_file}"')
+                            if etree_elements is None:
+                                self.report_document_progress(len(chunk))
+                            continue
+
+                    if etree_elements is None:
+                        # Convert items to ElementTree elements
+                        etree_elements = [
+                            element for _, element in self.iter_document_elements(chunk)
+                        ]
+
+                    # Set (replace) the exported objects for this file
+                    self.xml_builder.set_exported_objects(etree_elements)
+
+                    if print_result:
+                        print(self.xml_builder.to_pretty_xml())
+
+                    if write_result:
+                        if self.show_progress:
+                            report(f'\nWriting document to "{output_file}" ...')
+
+                        self.xml_builder.write_xml(
+                            output_file, show_progress=self.show_progress
+                        )
+                        if self.manifest is not None:
+                            self.manifest.record(output_file, inputs_hash)
+
+            if write_result and self.manifest is not None:
+                self.manifest.save()
+            if self.copy_cache is not None:
+                self.copy_cache.flush()
+
+            if write_result and self.show_progress:
                 if file_count > 1:
-                    # Multiple files: add suffix _1.xml, _2.xml, etc.
-                    base_name = self.xml_out_file.rsplit('.', 1)[0]  # Remove .xml extension
-                    extension = self.xml_out_file.rsplit('.', 1)[1] if '.' in self.xml_out_file else 'xml'
-                    output_file = f"{base_name}_{file_index + 1}.{extension}"
+                    report(f"\nDone. Created {file_count} files.\n")
                 else:
-                    # Single file: use original filename
-                    output_file = self.xml_out_file
-                
-                if self.show_progress:
-                    print(f'\nWriting document to "{output_file}" ...')
-                
-                self.xml_builder.write_xml(output_file)
-        
-        if write_result and self.show_progress:
-            if file_count > 1:
-                print(f"\nDone. Created {file_count} files.\n")
-            else:
-                print("\nDone.\n")
+                    report("\nDone.\n")
+
+    def report_document_progress(self, steps=1):
+        progress, size = self._document_progress
+        for _ in range(steps):
+            progress = self.stdout_progress(progress, size)
+        self._document_progress = (progress, size)
+
+    def make_document_element(self, item, fragment=False):
+        """
+        returns the ElementTree Element written to the document's ExportedObjects for an
+        item: a template element copy (minidom or ElementTree Element) or a copy plan job.
+        If fragment is True, the element is returned pretty-printed for its place in the
+        document, as a RawXMLElement, so its size is known and it is not serialized again.
+        """
+        # Check if it's a minidom Element before converting
+        if isinstance(item, xml.dom.minidom.Element):
+            etree_element = convert_minidom_to_etree(item)
+        elif isinstance(item, ET.Element):
+            etree_element = item  # Already an ElementTree Element
+        elif isinstance(item, tuple):
+            etree_element = self.make_plan_element(item)  # copy plan job
+        else:
+            # Handle other types or raise an error
+            raise TypeError(f"Unexpected element type: {type(item)}")
+        # report progress
+        self.report_document_progress()
+        if fragment and not isinstance(etree_element, RawXMLElement):
+            # ExportedObjects children are at depth 2 in the document
+            with trace_timer(self.tracer, "serialization"):
+                etree_element = RawXMLElement(
+                    to_pretty_xml_fragment(
+                        etree_element, "  " * 2, "  ", self.xml_builder.CDATA_TAGS
+                    )
+                )
+        return etree_element
+
+    def iter_document_elements(self, items, fragment=False):
+        """
+        yields (item, element) for each make_document item, see make_document_element.
+        While make_document has worker processes running, see copy_workers, the copy
+        jobs of the plain copy plan (as made by iter_copy_plan) are made BATCH_SIZE items
+        at a time across the workers, so only one batch of copies is held in memory.
+        Other items, eg folder jobs, are made in this process.
+        """
+        if self.copy_executor is None:
+            for item in items:
+                yield item, self.make_document_element(item, fragment)
+            return
+        elements = self.template_child_elements_dict["ExportedObjects"]
+        number_of_elements = len(elements)
+        for batch in iter_chunks(items, self.BATCH_SIZE):
+            first = batch[0][1] if isinstance(batch[0], tuple) else 0
+            # copy jobs of consecutive rows, each row having a job per template element
+            if not all(
+                isinstance(item, tuple)
+                and item[0] == "copy"
+                and item[1] == (first + position) % number_of_elements
+                for position, item in enumerate(batch)
+            ):
+                for item in batch:
+                    yield item, self.make_document_element(item, fragment)
+                continue
+            rows = [
+                job[2]
+                for position, job in enumerate(batch)
+                if position == 0 or job[1] == 0
+            ]
+            # the copies of whole rows, the batch may start and end part way through a row
+            copies = self.make_copies_in_workers(elements, rows, depth=2)
+            for item, copy in zip(batch, copies[first : first + len(batch)]):
+                yield item, self.make_document_element(copy, fragment)
+
+    @contextlib.contextmanager
+    def copy_workers(self):
+        """
+        runs self.workers worker processes, shared by every batch of copies made by
+        iter_document_elements, until the end of the with block. Does nothing if
+        self.workers is None or 1.
+        """
+        if self.workers is None or self.workers <= 1:
+            yield
+            return
+        elements = self.template_child_elements_dict.get("ExportedObjects", [])
+        with self.start_copy_workers(elements) as executor:
+            self.copy_executor = executor
+            try:
+                yield
+            finally:
+                self.copy_executor = None
+
+    def iter_sized_document_chunks(
+        self, exported_objects, max_bytes_per_file, max_items_per_file=None
+    ):
+        """
+        yields a (items, elements, is_last) chunk for each file of make_document, made by
+        iter_sized_chunks from the ExportedObjects items as their elements are made.
+        """
+        made_elements = self.iter_document_elements(exported_objects, fragment=True)
+        for chunk, is_last in iter_sized_chunks(
+            made_elements,
+            max_bytes=max_bytes_per_file,
+            max_items=max_items_per_file,
+            get_size=lambda made: get_fragment_size(made[1], 2),
+        ):
+            yield [item for item, _ in chunk], [e for _, e in chunk], is_last
+
+    def iter_balanced_document_chunks(self, exported_objects, number_of_files):
+        """
+        yields a (items, None, is_last) chunk for each of number_of_files files of about
+        the same size, see split_sizes_evenly. The size of every item is measured first,
+        its elements are made by make_document when its file is written.
+        """
+        exported_objects = list(exported_objects)
+        if self.show_progress:
+            report("Measuring copies...")
+        sizes = [
+            get_fragment_size(element, 2)
+            for _, element in self.iter_document_elements(
+                exported_objects, fragment=True
+            )
+        ]
+        # the elements are made again as each file is written
+        if self.show_progress:
+            report("\nSplitting copies into %d files..." % number_of_files)
+        self._document_progress = (1, self._document_progress[1])
+        chunk_lengths = split_sizes_evenly(sizes, number_of_files)
+        start = 0
+        for file_index, chunk_length in enumerate(chunk_lengths):
+            yield (
+                exported_objects[start : start + chunk_length],
+                None,
+                file_index + 1 == len(chunk_lengths),
+            )
+            start += chunk_length
 
     def make_copies(self):
         """
@@ -370,30 +971,163 @@ class ApplicationFactory(object):
                 {'Sheet1A': 'VAV-L16-INT10', 'Sheet1B': 'L16-INT10'},
                 {'Sheet1A': 'VAV-L16-INT11', 'Sheet1B': 'L16-INT11'}
         ]
+        factory_copies_dict['ExportedObjects'] holds ElementTree Elements made by make_copy,
+        one per template element per copy.
         """
-        # report progress
-        if self.show_progress:
-            print("Creating copies...")
-        size = len(self.factory_copy_substrings)
-        progress = 1
-        # create empty factory copies dictionary
-        factory_copies_dict = {key: [] for key in self.template_child_elements_dict}
-
-        # Copy Types elements as-is (no modifications needed)
-        if "Types" in self.template_child_elements_dict:
-            factory_copies_dict["Types"] = self.template_child_elements_dict["Types"][:]
-
-        # Only make copies for ExportedObjects, not Types
-        if "ExportedObjects" in self.template_child_elements_dict:
-            elements = self.template_child_elements_dict["ExportedObjects"]
-            # loop through copy strings list
-            for copy_substrings in self.factory_copy_substrings:
-                for element in elements:
-                    copy_element = self.replace_placeholders(element, copy_substrings)
-                    factory_copies_dict["ExportedObjects"].append(copy_element)
-                # report progress
-                progress = self.stdout_progress(progress, size)
-        self.factory_copies_dict = factory_copies_dict
+        with trace_stage(
+            self.tracer, "make_copies", rows=len(self.factory_copy_substrings)
+        ):
+            # report progress
+            if self.show_progress:
+                report("Creating copies...")
+            size = len(self.factory_copy_substrings)
+            progress = 1
+            # create empty factory copies dictionary
+            factory_copies_dict = {key: [] for key in self.template_child_elements_dict}
+
+            # Copy Types elements as-is (no modifications needed)
+            if "Types" in self.template_child_elements_dict:
+                factory_copies_dict["Types"] = self.template_child_elements_dict[
+                    "Types"
+                ][:]
+
+            # Only make copies for ExportedObjects, not Types
+            if "ExportedObjects" in self.template_child_elements_dict:
+                elements = self.template_child_elements_dict["ExportedObjects"]
+                if self.workers is not None and self.workers > 1:
+                    factory_copies_dict["ExportedObjects"] = (
+                        self.make_copies_in_workers(
+                            elements, self.factory_copy_substrings, depth=2
+                        )
+                    )
+                elif self.copy_cache is None:
+                    # render the copies a batch of rows at a time
+                    for batch in iter_chunks(
+                        self.factory_copy_substrings, self.BATCH_SIZE
+                    ):
+                        factory_copies_dict["ExportedObjects"].extend(
+                            self.make_copy_batch(elements, batch)
+                        )
+                        # report progress
+                        progress = self.stdout_progress(progress + len(batch) - 1, size)
+                else:
+                    # loop through copy strings list
+                    for copy_substrings in self.factory_copy_substrings:
+                        for element in elements:
+                            copy_element = self.make_copy(element, copy_substrings)
+                            factory_copies_dict["ExportedObjects"].append(copy_element)
+                        # report progress
+                        progress = self.stdout_progress(progress, size)
+            self.factory_copies_dict = factory_copies_dict
+            # the copy plan job of each copy, see make_document
+            self.factory_copies_plan = list(self.iter_copy_plan())
+            if self.copy_cache is not None:
+                self.copy_cache.flush()
+
+    def make_copies_in_workers(self, elements, factory_copy_substrings, depth):
+        """
+        makes copies of each template element for each copy substrings row across
+        self.workers processes and returns them in spreadsheet order, the same order as
+        the single process loop in make_copies.
+        The compiled templates are sent to each worker once, when the worker starts. Each
+        worker renders (and if self.validate_copies, parses) its rows and returns each copy
+        as a pretty-printed xml fragment laid out for the given depth in the document, so
+        the copies are returned as RawXMLElements and do not need to be parsed again.
+        If self.copy_cache is set, only the rows with a copy missing from the cache are
+        sent to the workers.
+        """
+        rows = [
+            self.get_copy_values(copy_substrings)
+            for copy_substrings in factory_copy_substrings
+        ]
+        if self.copy_cache is None:
+            fragments = self.make_fragments_in_workers(elements, rows, depth)
+            return [RawXMLElement(fragment) for fragment in fragments]
+        template_hashes = [self.get_template_hash(element) for element in elements]
+        keys = [
+            self.copy_cache.get_key(template_hash, values, self.validate_copies)
+            for values in rows
+            for template_hash in template_hashes
+        ]
+        fragments = [self.copy_cache.get(key) for key in keys]
+        number_of_elements = len(elements)
+        missing_rows = [
+            row_index
+            for row_index in range(len(rows))
+            if None
+            in fragments[
+                row_index * number_of_elements : (row_index + 1) * number_of_elements
+            ]
+        ]
+        # cached copies are laid out for depth 0, see make_cached_copy
+        made_fragments = iter(
+            self.make_fragments_in_workers(
+                elements, [rows[row_index] for row_index in missing_rows], 0
+            )
+        )
+        for row_index in missing_rows:
+            for position in range(
+                row_index * number_of_elements, (row_index + 1) * number_of_elements
+            ):
+                fragment = next(made_fragments)
+                if fragments[position] is None:
+                    fragments[position] = fragment
+                    self.copy_cache.put(keys[position], fragment)
+        self.copy_cache.flush()
+        copies = []
+        for position, fragment in enumerate(fragments):
+            if self.validate_copies:
+                fragment = indent_xml_fragment(fragment, "  " * depth)
+            if fragment is None:
+                element = elements[position % number_of_elements]
+                values = rows[position // number_of_elements]
+                fragment = self.make_copy_fragment(element, values, depth)
+            copies.append(RawXMLElement(fragment))
+        return copies
+
+    def start_copy_workers(self, elements):
+        """
+        returns a ProcessPoolExecutor of self.workers processes, each sent the compiled
+        templates of elements once, when it starts, see make_copy_fragments.
+        """
+        compiled_templates = [self.get_compiled_template(e) for e in elements]
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_copy_worker,
+            initargs=(
+                compiled_templates,
+                self.validate_copies,
+                self.xml_builder.CDATA_TAGS,
+            ),
+        )
+
+    def make_fragments_in_workers(self, elements, rows, depth):
+        """
+        returns the copies of each template element for each row of replacement values,
+        made across self.workers processes, as xml fragments in row order.
+        The workers of self.copy_executor are used if make_document has started them,
+        progress is then reported by make_document.
+        """
+        size = len(rows)
+        if size == 0:
+            return []
+        # several chunks per worker so progress is reported and the load evens out
+        chunk_size = max(1, -(-size // (self.workers * 4)))
+        chunks = [rows[i : i + chunk_size] for i in range(0, size, chunk_size)]
+        indents = ["  " * depth] * len(chunks)
+        if self.copy_executor is not None:
+            made_chunks = self.copy_executor.map(make_copy_fragments, chunks, indents)
+            return [fragment for fragments in made_chunks for fragment in fragments]
+        made_fragments = []
+        progress = 0
+        with self.start_copy_workers(elements) as executor:
+            for chunk, fragments in zip(
+                chunks, executor.map(make_copy_fragments, chunks, indents)
+            ):
+                made_fragments.extend(fragments)
+                progress += len(chunk)
+                self.stdout_progress(progress, size)
+        return made_fragments
 
     def get_unique_copies_for_placeholder(self, placeholder):
         """
@@ -407,6 +1141,7 @@ class ApplicationFactory(object):
                                                   {'controllersA': 'Controller 6', 'controllersB': 'IRD-ICG-L00'}}
         and placeholder = 'IRD-ICG-B03'
         then return {'controllersB': ['IRD-ICG-B04', 'IRD-ICG-B05', 'IRD-ICG-L00']}
+        The unique copy strings are listed in the order they first appear.
         """
         unique_copies = {}
 
@@ -414,102 +1149,378 @@ class ApplicationFactory(object):
         for key, placeholder_value in self.factory_placeholders.items():
             if placeholder_value == placeholder:
                 # Collect unique values for this key from factory_copy_substrings
-                unique_values = set()
+                unique_values = {}
                 for copy_dict in self.factory_copy_substrings:
                     if key in copy_dict:
-                        unique_values.add(copy_dict[key])
+                        unique_values.setdefault(copy_dict[key])
 
-                # Convert set to list and store
                 unique_copies[key] = list(unique_values)
 
         return unique_copies
 
-    def make_copies_in_folders(self, placeholder_folder_name):
+    def get_placeholder_key(self, placeholder):
+        """
+        returns the key (sheetname + column letter) of the first column whose placeholder
+        is the placeholder string, eg 'controllersB' for 'IRD-ICG-B03'.
+        Raises ValueError if no column has this placeholder.
+        """
+        for key, placeholder_value in self.factory_placeholders.items():
+            if placeholder_value == placeholder:
+                return key
+        raise ValueError(f"No factory placeholder column for '{placeholder}'")
+
+    def make_copies_in_folders(self, placeholder_folder_name, defer_copies=False):
         """
         based on the placeholder_folder_name, create an EBO folder for each unique copy
         and put all copied with mtching value for this column inside the folder
 
-        """
-        # report progress
-        if self.show_progress:
-            print("Creating copies in folders...")
-        size = len(self.factory_copy_substrings)
-        progress = 1
-        factory_copies_dict = {key: [] for key in self.template_child_elements_dict}
+        placeholder_folder_name may also be a list of placeholders, one per folder level,
+        to make nested folders, eg ['{{building}}', '{{level}}'] makes a folder for each
+        building holding a folder for each level in that building.
 
-        # Copy Types elements as-is (no modifications needed)
-        if "Types" in self.template_child_elements_dict:
-            factory_copies_dict["Types"] = self.template_child_elements_dict["Types"][:]
+        Folders are made in the order their names first appear in the spreadsheet and
+        each folder holds its copies in spreadsheet order. Copies with an empty folder
+        cell are put directly in the parent folder (or at the top level). Copies from
+        sheets without the folder column are not made.
 
-        copy_folder_names = self.get_unique_copies_for_placeholder(
-            placeholder_folder_name
-        )
-        print(copy_folder_names)
-        # get key of placeholder_folder_name
-        # if self.factory_placeholders: dict = {'controllersA': 'Controller 1', 'controllersB': 'IRD-ICG-B03'} and placeholder_folder_name = 'IRD-ICG-B03' return 'controllersB'
-        folder_key = None
-        for key, value in self.factory_placeholders.items():
-            if value == placeholder_folder_name:
-                folder_key = key
-                break
-        print(f"Folder key for '{placeholder_folder_name}': {folder_key}")
-        folders = []
-        for folder_name in copy_folder_names[folder_key]:
-            # filter self.factory_copy_substrings to only those that have the folder_key: copy_folder_name
-            filtered_copy_substrings = [
-                item
-                for item in self.factory_copy_substrings
-                if item.get(folder_key) == folder_name
+        If defer_copies is True (or self.manifest is set), only the copy plan is made,
+        see get_folder_copy_plan, and the copies are made by make_document.
+        """
+        with trace_stage(
+            self.tracer,
+            "make_copies_in_folders",
+            rows=len(self.factory_copy_substrings),
+        ):
+            # report progress
+            if self.show_progress:
+                report("Creating copies in folders...")
+            factory_copies_dict = {key: [] for key in self.template_child_elements_dict}
+
+            # Copy Types elements as-is (no modifications needed)
+            if "Types" in self.template_child_elements_dict:
+                factory_copies_dict["Types"] = self.template_child_elements_dict[
+                    "Types"
+                ][:]
+
+            if isinstance(placeholder_folder_name, str):
+                placeholder_folder_name = [placeholder_folder_name]
+            folder_keys = [
+                self.get_placeholder_key(placeholder)
+                for placeholder in placeholder_folder_name
             ]
-            # print(f"Folder name for '{folder_name}': {filtered_copy_substrings}")
-            folder_element = self.xml_builder.create_folder(folder_name)
-
-            elements = self.template_child_elements_dict["ExportedObjects"]
-            # loop through copy strings list
-            for copy_substrings in filtered_copy_substrings:
-                for element in elements:
-                    copy_element = self.replace_placeholders(element, copy_substrings)
-                    etree_element = convert_minidom_to_etree(copy_element)
-                    folder_element.append(etree_element)
+            folder_index = index_copies_by_folder(
+                self.factory_copy_substrings, folder_keys
+            )
+            if self.show_progress:
+                report(
+                    f"Folder keys for {placeholder_folder_name}: {folder_keys}, "
+                    f"{len(folder_index['folders'])} top level folders",
+                    level=logging.DEBUG,
+                )
+            copy_plan = self.get_folder_copy_plan(folder_index)
+            if defer_copies or self.manifest is not None:
+                # copies are made by make_document, one file at a time and only for the
+                # files that have changed
+                self.copy_plan = copy_plan
+                return
+            size = len(copy_plan)
+            progress = 1
+            for job in copy_plan:
+                factory_copies_dict["ExportedObjects"].append(
+                    self.make_plan_element(job)
+                )
                 # report progress
-            progress = self.stdout_progress(progress, size)
-            folders.append(folder_element)
-        factory_copies_dict["ExportedObjects"] = folders
-        self.factory_copies_dict = factory_copies_dict
+                progress = self.stdout_progress(progress, size)
+            self.factory_copies_dict = factory_copies_dict
+            # the copy plan job of each copy, see make_document
+            self.factory_copies_plan = copy_plan
+            if self.copy_cache is not None:
+                self.copy_cache.flush()
 
-    def replace_placeholders(self, element, copy_substrings):
+    def iter_copy_plan(self):
         """
-        find and replace xml element template placeholder strings with copy strings
+        yields the copy plan of make_copies: a ('copy', element_index, copy_substrings)
+        job for each template ExportedObjects element for each copy substrings row.
+        A copy plan lists the ExportedObjects of the document without making them, see
+        make_plan_element.
         """
-        # convert DOM Element to xml string
-        factory_copy_element_str = element.toxml()
-        # find and replace placeholders with copy values
-        for key, placeholder_value in self.factory_placeholders.items():
-            copy_value = copy_substrings.get(key)
-            if copy_value is None:
-                # print(f"Warning: copy_substrings[{key}] is None. Skipping replacement.")
-                continue  # Skip this iteration if the value is None
-            else:
-                # Ensure the copy_value is a string
-                copy_value = str(copy_value)
-                factory_copy_element_str = factory_copy_element_str.replace(
-                    placeholder_value, copy_value
+        element_indexes = range(
+            len(self.template_child_elements_dict.get("ExportedObjects", []))
+        )
+        for copy_substrings in self.factory_copy_substrings:
+            for element_index in element_indexes:
+                yield ("copy", element_index, copy_substrings)
+
+    def get_folder_copy_plan(self, folder_index):
+        """
+        returns the copy plan of make_copies_in_folders for a folder_index node made by
+        index_copies_by_folder: copy jobs first, then a ('folder', folder_name, jobs) job
+        for each folder.
+        """
+        element_indexes = range(
+            len(self.template_child_elements_dict["ExportedObjects"])
+        )
+        copy_plan = [
+            ("copy", element_index, copy_substrings)
+            for copy_substrings in folder_index["copies"]
+            for element_index in element_indexes
+        ]
+        for folder_name, sub_index in folder_index["folders"].items():
+            copy_plan.append(
+                ("folder", folder_name, self.get_folder_copy_plan(sub_index))
+            )
+        return copy_plan
+
+    def make_plan_element(self, job, depth=2):
+        """
+        returns the ElementTree Element for a copy plan job at depth in the document: a
+        copy of a template element made by make_copy, or an EBO folder holding the
+        elements of its jobs.
+        """
+        kind, key, value = job
+        if kind == "copy":
+            element = self.template_child_elements_dict["ExportedObjects"][key]
+            return self.make_copy(element, value, depth)
+        folder_element = self.xml_builder.create_folder(str(key))
+        folder_element.extend(
+            self.make_plan_element(sub_job, depth + 1) for sub_job in value
+        )
+        return folder_element
+
+    def get_inputs_hash(self, copy_plan):
+        """
+        returns a hash of everything the document made from the copy plan depends on: the
+        builder settings, the template elements, the placeholder row and the
+        substitution row of each copy. Used to check self.manifest.
+        Keys are sorted, so the hash does not depend on dict order or the hash seed.
+        """
+        if not hasattr(self, "_inputs_hash_base"):
+            base_inputs = {
+                "settings": [
+                    self.xml_builder.ebo_version,
+                    self.xml_builder.server_full_path,
+                    self.xml_builder.export_mode,
+                    self.validate_copies,
+                    self.placeholder_matching,
+                ],
+                "templates": {
+                    key: [to_xml_string(element) for element in elements]
+                    for key, elements in self.template_child_elements_dict.items()
+                },
+                "placeholders": list(self.factory_placeholders.items()),
+            }
+            self._inputs_hash_base = hashlib.sha256(
+                json.dumps(base_inputs, default=str, sort_keys=True).encode("utf-8")
+            ).digest()
+        inputs_hash = hashlib.sha256(self._inputs_hash_base)
+        inputs_hash.update(
+            json.dumps(
+                [self.get_plan_inputs(job) for job in copy_plan],
+                default=str,
+                sort_keys=True,
+            ).encode("utf-8")
+        )
+        return inputs_hash.hexdigest()
+
+    def get_plan_inputs(self, job):
+        kind, key, value = job
+        if kind == "copy":
+            return [key, self.get_copy_values(value)]
+        return [str(key), [self.get_plan_inputs(sub_job) for sub_job in value]]
+
+    def get_compiled_template(self, element):
+        """
+        returns the CompiledTemplate for a template element, compiling it on first use.
+        Each template element is serialized and split into literal segments and
+        placeholder slots only once, regardless of how many copies are made.
+        """
+        if not hasattr(self, "_compiled_templates"):
+            self._compiled_templates = {}
+            self._placeholder_keys = list(self.factory_placeholders.keys())
+        cached = self._compiled_templates.get(id(element))
+        if cached is None:
+            compiled = CompiledTemplate(
+                to_xml_string(element),
+                [self.factory_placeholders[key] for key in self._placeholder_keys],
+                matching=self.placeholder_matching,
+            )
+            # keep a reference to element so its id is not reused
+            cached = (element, compiled)
+            self._compiled_templates[id(element)] = cached
+        return cached[1]
+
+    def render_copy(self, element, copy_substrings):
+        """
+        returns the xml string of a copy of the template element with placeholder strings
+        replaced by copy strings. Placeholders are replaced in column order, see CompiledTemplate.
+        """
+        compiled = self.get_compiled_template(element)
+        with trace_timer(self.tracer, "substitution"):
+            return compiled.render(self.get_copy_values(copy_substrings))
+
+    def get_copy_values(self, copy_substrings):
+        """
+        returns the copy strings of one row in placeholder order, None where the row has
+        no value for a placeholder.
+        A FactoryRow is read by position: the positions of the placeholder keys are
+        looked up once per row index (ie once per sheet) rather than once per row.
+        """
+        if not hasattr(self, "_placeholder_keys"):
+            self._placeholder_keys = list(self.factory_placeholders.keys())
+        if not isinstance(copy_substrings, FactoryRow):
+            return [copy_substrings.get(key) for key in self._placeholder_keys]
+        if not hasattr(self, "_row_positions"):
+            self._row_positions = {}
+        index = copy_substrings.index
+        cached = self._row_positions.get(id(index))
+        if cached is None:
+            # keep a reference to index so its id is not reused
+            cached = (index, [index.get(key) for key in self._placeholder_keys])
+            self._row_positions[id(index)] = cached
+        values = copy_substrings._values
+        return [
+            None if position is None else values[position] for position in cached[1]
+        ]
+
+    def make_copy(self, element, copy_substrings, depth=2):
+        """
+        returns an ElementTree Element copy of the template element with placeholder strings
+        replaced by copy strings. The rendered copy is parsed once, or not at all if
+        self.validate_copies is False, in which case a RawXMLElement holding the rendered
+        xml string is returned.
+        If self.copy_cache is set, see make_cached_copy, the copy is laid out for depth,
+        the depth of the copy in the document: 2 for ExportedObjects children, 3 for
+        children of a folder in ExportedObjects and so on.
+        """
+        if self.copy_cache is not None:
+            return self.make_cached_copy(element, copy_substrings, depth)
+        factory_copy_element_str = self.render_copy(element, copy_substrings)
+        if self.validate_copies:
+            with trace_timer(self.tracer, "parsing"):
+                return parse_xml_fragment(factory_copy_element_str)
+        return RawXMLElement(factory_copy_element_str)
+
+    def make_copy_batch(self, elements, factory_copy_substrings):
+        """
+        returns the copies of each template element for each copy substrings row, in
+        the same order as calling make_copy for each element of each row. Each template
+        element's copies for the whole batch are rendered in one call, see
+        CompiledTemplate.render_rows. Does not use self.copy_cache.
+        """
+        rows = [
+            self.get_copy_values(copy_substrings)
+            for copy_substrings in factory_copy_substrings
+        ]
+        compiled_templates = [self.get_compiled_template(e) for e in elements]
+        with trace_timer(self.tracer, "substitution"):
+            rendered = [compiled.render_rows(rows) for compiled in compiled_templates]
+        copies = []
+        for row_copies in zip(*rendered):
+            for factory_copy_element_str in row_copies:
+                if self.validate_copies:
+                    with trace_timer(self.tracer, "parsing"):
+                        copies.append(parse_xml_fragment(factory_copy_element_str))
+                else:
+                    copies.append(RawXMLElement(factory_copy_element_str))
+        return copies
+
+    def make_cached_copy(self, element, copy_substrings, depth):
+        """
+        returns a RawXMLElement copy of the template element from self.copy_cache, laid
+        out for the depth in the document. Copies missing from the cache are made by
+        make_copy_fragment then added to it.
+        Copies are cached laid out for depth 0 and indented for their depth when used,
+        so the same cached copy is used in and out of folders.
+        """
+        values = self.get_copy_values(copy_substrings)
+        key = self.copy_cache.get_key(
+            self.get_template_hash(element), values, self.validate_copies
+        )
+        fragment = self.copy_cache.get(key)
+        if fragment is None:
+            fragment = self.make_copy_fragment(element, values, 0)
+            self.copy_cache.put(key, fragment)
+        if self.validate_copies:
+            fragment = indent_xml_fragment(fragment, "  " * depth)
+            if fragment is None:
+                # text content spanning several lines, lay out the copy for its depth
+                fragment = self.make_copy_fragment(element, values, depth)
+        return RawXMLElement(fragment)
+
+    def make_copy_fragment(self, element, values, depth):
+        """
+        returns the xml string of a copy of the template element made with the
+        replacement values, if self.validate_copies, parsed and pretty-printed for the
+        depth in the document, see to_pretty_xml_fragment.
+        """
+        compiled = self.get_compiled_template(element)
+        with trace_timer(self.tracer, "substitution"):
+            fragment = compiled.render(values)
+        if self.validate_copies:
+            with trace_timer(self.tracer, "parsing"):
+                copy_element = parse_xml_fragment(fragment)
+            with trace_timer(self.tracer, "serialization"):
+                fragment = to_pretty_xml_fragment(
+                    copy_element, "  " * depth, "  ", self.xml_builder.CDATA_TAGS
                 )
+        return fragment
 
+    def get_template_hash(self, element):
+        """
+        returns the self.copy_cache template hash of a template element, from its xml
+        string, placeholders, placeholder matching mode and the builder's CDATA_TAGS.
+        """
+        if not hasattr(self, "_template_hashes"):
+            self._template_hashes = {}
+        cached = self._template_hashes.get(id(element))
+        if cached is None:
+            compiled = self.get_compiled_template(element)
+            template_hash = self.copy_cache.get_template_hash(
+                compiled.template_str,
+                compiled.placeholders,
+                compiled.matching,
+                self.xml_builder.CDATA_TAGS,
+            )
+            # keep a reference to element so its id is not reused
+            cached = (element, template_hash)
+            self._template_hashes[id(element)] = cached
+        return cached[1]
+
+    def replace_placeholders(self, element, copy_substrings):
+        """
+        find and replace xml element template placeholder strings with copy strings
+        """
+        factory_copy_element_str = self.render_copy(element, copy_substrings)
         # convert xml string back to DOM Element
-        # print("convert xml string back to DOM Element:")
-        # print_first_22_lines(factory_copy_element_str)
-        # print(element.tagName)
-        # handle ampersand, parse to xml
-        factory_copy_element_str = re.sub(
-            r"&(?!(?:amp|lt|gt|apos|quot);)", "&amp;", factory_copy_element_str
-        )
-        # factory_copy_element_str = escape(factory_copy_element_str, {"&": "&amp;"})
-        factory_copy_element = minidom.parseString(
-            factory_copy_element_str
-        ).getElementsByTagName(element.tagName)[0]
-        # self.xml_in_doc.getElementsByTagName(tagname)[0]
-        return factory_copy_element
+        return minidom.parseString(factory_copy_element_str).documentElement
+
+
+# state of a make_copies_in_workers worker process, set once by init_copy_worker
+copy_worker_state = None
+
+
+def init_copy_worker(compiled_templates, validate_copies, cdata_tags):
+    global copy_worker_state
+    copy_worker_state = (compiled_templates, validate_copies, cdata_tags)
+
+
+def make_copy_fragments(rows, indent):
+    """
+    renders a copy of each compiled template for each row of replacement values and
+    returns the copies as xml fragments laid out for indent, see
+    ApplicationFactory.make_copies_in_workers
+    """
+    compiled_templates, validate_copies, cdata_tags = copy_worker_state
+    rendered = [compiled.render_rows(rows) for compiled in compiled_templates]
+    fragments = []
+    for row_copies in zip(*rendered):
+        for copy_str in row_copies:
+            if validate_copies:
+                copy_str = to_pretty_xml_fragment(
+                    parse_xml_fragment(copy_str), indent, "  ", cdata_tags
+                )
+            fragments.append(copy_str)
+    return fragments
 
 
 def print_first_22_lines(s):
@@ -531,34 +1542,84 @@ class ApplicationFactoryManager(object):
         ebo_server_full_path="/EBOApplicationFactory_v0.1",
         ebo_export_mode="Special",
         show_progress=True,
+        workers=None,
+        template_cache=None,
+        csv_path=None,
+        manifest=None,
+        copy_cache=None,
+        tracer=None,
+        placeholder_matching=None,
     ):
         self.show_progress = show_progress
         self.xlfile = xlfile
+        # a CSV file or directory of CSV files (one per group) to read instead of xlfile
+        self.csv_path = csv_path
         self.xml_out_file_prefix = xml_out_file_prefix
         self.template_map = template_map
         self.max_items_per_file = (
             max_items_per_file  # Store the max_items_per_file value
         )
+        self.factory_settings = {
+            "ebo_version": ebo_version,
+            "ebo_server_full_path": ebo_server_full_path,
+            "ebo_export_mode": ebo_export_mode,
+            "placeholder_matching": placeholder_matching,
+        }
+        # number of worker processes used to make documents, None or 1 makes them in this process
+        self.workers = workers
+        # pass a TemplateCache with a cache_dir to reuse parsed templates between runs
+        if template_cache is None:
+            template_cache = TemplateCache()
+        self.template_cache = template_cache
+        # pass a BuildManifest to only rewrite files whose inputs have changed
+        self.manifest = manifest
+        # pass a RenderedCopyCache to reuse copies rendered by this or earlier runs
+        self.copy_cache = copy_cache
+        # Types are converted once per run and shared by every group's documents
+        self.type_cache = ObjectTypeCache(EBOXMLBuilder.CDATA_TAGS)
+        # pass an instrumentation.Tracer to receive build events, see Tracer
+        self.tracer = tracer
 
         self.get_factory_inputs(sheetname=sheetname)
         self.get_app_templates()
 
     def get_app_templates(self):
+        """
+        loads the template for each group in self.template_map into items["elements"].
+        Templates are loaded through self.template_cache, so each template file is parsed
+        once and its elements (as xml strings) are shared by every group that uses it.
+        """
         if self.show_progress:
-            print("\nCreating template documents...")
+            report("\nCreating template documents...")
         for group, items in self.template_map.items():
-            print('\nCreating template document for "' + group + '" applications...')
-            print(items)
-            items["elements"] = ApplicationTemplate(
-                items["templateFilename"], print_result=False
-            ).template_child_elements_dict
+            if self.show_progress:
+                report(
+                    '\nCreating template document for "' + group + '" applications...'
+                )
+                report(str(items), level=logging.DEBUG)
+            items["elements"] = self.template_cache.get_template_child_elements_dict(
+                items["templateFilename"]
+            )
 
     def get_factory_inputs(self, sheetname=None):
-        if self.show_progress:
-            print('\nCreating factory inputs from workbook "' + self.xlfile + '"')
-        self.factory_inputs = FactoryInputsFromSpreadsheet(
-            self.xlfile, sheetname=sheetname, print_result=False
-        )
+        if self.csv_path is not None:
+            if self.show_progress:
+                report('\nCreating factory inputs from "' + self.csv_path + '"')
+            self.factory_inputs = FactoryInputsFromCsv(
+                self.csv_path,
+                sheetname=sheetname,
+                print_result=False,
+                show_progress=self.show_progress,
+            )
+        else:
+            if self.show_progress:
+                report('\nCreating factory inputs from workbook "' + self.xlfile + '"')
+            self.factory_inputs = FactoryInputsFromSpreadsheet(
+                self.xlfile,
+                sheetname=sheetname,
+                print_result=False,
+                show_progress=self.show_progress,
+            )
         self.factory_placeholders_sorted = (
             self.factory_inputs.factory_placeholders_sorted
         )
@@ -566,15 +1627,19 @@ class ApplicationFactoryManager(object):
             self.factory_inputs.factory_copy_substrings_sorted
         )
 
-    def make_documents(self):
+    def get_production_batches(self):
+        """
+        returns a list of (group, xml_out_file, batch_copy_substrings) tuples, one per
+        xml file to be written, in sheet order then batch order.
+        Each sheet (group) is split into batches of no more than self.max_items_per_file
+        copies, each written to its own file named <xml_out_file_prefix>_<group>_<n>.xml
+        """
+        batches = []
         for (
             group,
             factory_copy_substrings,
         ) in self.factory_copy_substrings_sorted.items():
 
-            if self.show_progress:
-                print('\nStarting production on "' + group + '" applications...')
-
             # Calculate the number of files needed based on max_items_per_file
             if self.max_items_per_file is None:
                 num_files = 1
@@ -596,28 +1661,173 @@ class ApplicationFactoryManager(object):
                         (i + 1) * self.max_items_per_file, len(factory_copy_substrings)
                     )
                 batch_copy_substrings = factory_copy_substrings[start_idx:end_idx]
-
-                # Create ApplicationFactory for each batch of instances
-                app_factory = ApplicationFactory(
-                    template_child_elements_dict=self.template_map[group]["elements"],
-                    factory_placeholders=self.factory_placeholders_sorted[group],
-                    factory_copy_substrings=batch_copy_substrings,
-                    xml_out_file=self.xml_out_file_prefix
+                xml_out_file = (
+                    self.xml_out_file_prefix
                     + "_"
                     + group
                     + "_"
                     + str(i + 1)
-                    + ".xml",  # Append index to file name
+                    + ".xml"  # Append index to file name
                 )
-                app_factory.make_document()
-
-            # app_factory = ApplicationFactory(
-            # 	template_child_elements_dict=self.template_map[group]['elements'],
-            # 	factory_placeholders=self.factory_placeholders_sorted[group],
-            # 	factory_copy_substrings=factory_copy_substrings,
-            # 	xml_out_file=self.xml_out_file_prefix+'_'+group+'.xml',
-            # )
-            # app_factory.make_document()
+                batches.append((group, xml_out_file, batch_copy_substrings))
+        return batches
+
+    def make_documents(self):
+        batches = self.get_production_batches()
+        with trace_stage(self.tracer, "make_documents", files=len(batches)):
+            if self.workers is not None and self.workers > 1:
+                self.make_documents_in_workers(batches)
+            else:
+                self.make_documents_in_process(batches)
+        if self.manifest is not None:
+            self.manifest.save()
+            if self.show_progress:
+                report(
+                    f"\nSkipped {len(self.manifest.skipped)} unchanged files, "
+                    f"wrote {len(self.manifest.written)} files."
+                )
+
+    def make_documents_in_process(self, batches):
+        current_group = None
+        for group, xml_out_file, batch_copy_substrings in batches:
+            if self.show_progress and group != current_group:
+                report('\nStarting production on "' + group + '" applications...')
+            current_group = group
+
+            # Create ApplicationFactory for each batch of instances
+            app_factory = ApplicationFactory(
+                template_child_elements_dict=self.template_map[group]["elements"],
+                factory_placeholders=self.factory_placeholders_sorted[group],
+                factory_copy_substrings=batch_copy_substrings,
+                xml_out_file=xml_out_file,
+                show_progress=self.show_progress,
+                manifest=self.manifest,
+                copy_cache=self.copy_cache,
+                type_cache=self.type_cache,
+                tracer=self.tracer,
+                **self.factory_settings,
+            )
+            app_factory.make_document()
+
+    def make_documents_in_workers(self, batches):
+        """
+        makes the documents for all batches, across all groups, in self.workers processes.
+        Each worker receives the template xml strings and placeholders of every group once,
+        when it starts, then makes and writes one batch file per task.
+        Progress is reported in sheet then batch order as batches complete, so the report
+        is the same on every run however the batches are scheduled.
+        If self.manifest is set, workers check each batch against a copy of it and
+        the files written or skipped are recorded in self.manifest as batches complete.
+        self.tracer is not sent to the workers, only a file_written event is emitted for
+        each file written, as batches complete.
+        """
+        groups = {group for group, _, _ in batches}
+        template_xml_strings = {
+            group: {
+                key: [to_xml_string(element) for element in elements]
+                for key, elements in self.template_map[group]["elements"].items()
+            }
+            for group in groups
+        }
+        factory_placeholders_sorted = {
+            group: self.factory_placeholders_sorted[group] for group in groups
+        }
+        if self.show_progress:
+            report(
+                "\nStarting production of %d files in %d worker processes..."
+                % (len(batches), self.workers)
+            )
+        current_group = None
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_production_worker,
+            initargs=(
+                template_xml_strings,
+                factory_placeholders_sorted,
+                self.factory_settings,
+                None if self.manifest is None else self.manifest.files,
+                self.copy_cache,
+                self.type_cache,
+            ),
+        ) as executor:
+            for (group, _, _), (xml_out_file, records) in zip(
+                batches, executor.map(make_production_document, batches)
+            ):
+                if self.manifest is not None:
+                    for record in records:
+                        self.manifest.record(*record)
+                skipped = records and records[-1][2]
+                if self.tracer is not None and not skipped:
+                    self.tracer.file_written(
+                        xml_out_file, os.path.getsize(xml_out_file)
+                    )
+                if self.show_progress:
+                    if group != current_group:
+                        report(
+                            '\nStarting production on "' + group + '" applications...'
+                        )
+                    if skipped:
+                        report(f"Skipped unchanged {xml_out_file}")
+                    else:
+                        report(f"XML written to {xml_out_file}")
+                current_group = group
+
+
+# state of a make_documents_in_workers worker process, set once by init_production_worker
+production_worker_state = None
+
+
+def init_production_worker(
+    template_xml_strings,
+    factory_placeholders_sorted,
+    factory_settings,
+    manifest_files,
+    copy_cache,
+    type_cache,
+):
+    global production_worker_state
+    production_worker_state = (
+        template_xml_strings,
+        factory_placeholders_sorted,
+        factory_settings,
+        manifest_files,
+        copy_cache,
+        type_cache,
+    )
+
+
+def make_production_document(batch):
+    """
+    makes and writes the xml file for one (group, xml_out_file, batch_copy_substrings)
+    batch, see ApplicationFactoryManager.make_documents_in_workers
+    returns (xml_out_file, manifest records), the records being empty without a manifest.
+    """
+    (
+        template_xml_strings,
+        factory_placeholders_sorted,
+        factory_settings,
+        manifest_files,
+        copy_cache,
+        type_cache,
+    ) = production_worker_state
+    group, xml_out_file, batch_copy_substrings = batch
+    manifest = None
+    if manifest_files is not None:
+        manifest = BuildManifest(files=manifest_files)
+    app_factory = ApplicationFactory(
+        template_child_elements_dict=template_xml_strings[group],
+        factory_placeholders=factory_placeholders_sorted[group],
+        factory_copy_substrings=batch_copy_substrings,
+        xml_out_file=xml_out_file,
+        show_progress=False,
+        manifest=manifest,
+        copy_cache=copy_cache,
+        type_cache=type_cache,
+        **factory_settings,
+    )
+    # show_progress is False, so the worker makes the document without reporting
+    app_factory.make_document()
+    return (xml_out_file, [] if manifest is None else manifest.records)
 
 
 def make_empty_factory_app_list_spreadsheet(xml_template_paths, xl_out_file=None):
@@ -1,8 +1,23 @@
 # Import the required library
-from xml.dom import minidom
 import xml.etree.ElementTree as ET
 import re
 import csv
+import io
+import mmap
+import os
+from xml.parsers import expat
+
+from .reporting import report
+
+XML_DECLARATION = '<?xml version="1.0" ?>'
+# tag name at the start of an xml fragment
+TAG_PATTERN = re.compile(r"\s*<([^\s/>]+)")
+# a line break in a pretty-printed fragment that is not followed by indentation and a tag
+TEXT_LINE_BREAK_PATTERN = re.compile(r"\n(?! *<)")
+# a {{tag}} placeholder, see iter_mustache_tags
+MUSTACHE_TAG_PATTERN = re.compile(r"{{(.*?)}}")
+# template files at least this big are memory-mapped by read_template_child_spans
+MMAP_MIN_BYTES = 16 * 1024 * 1024
 
 
 def find_elements_in_xml(file_path, element_name=None, attributes=None):
@@ -84,6 +99,167 @@ def find_child_elements_in_xml(
     return child_elements
 
 
+def iterparse_template_child_elements(
+    file_path, section_tags=("Types", "ExportedObjects")
+):
+    """
+    Streams an EBO export and yields (section tag, element) for each child element of
+    the sections named in section_tags (children of the root ObjectSet element), as soon
+    as the child has been read.
+
+    The file is read with ET.iterparse, so only one top level child is held in memory at
+    a time by this function: each yielded element is detached from its section, and
+    every other section (eg MetaInformation) is discarded once it has been read.
+    Whitespace only text and tails are removed, as in parse_xml_fragment.
+
+    Parameters:
+    - file_path (str | BinaryIO): The path to the XML file, or a binary file object.
+    - section_tags (Iterable[str]): Tags of the sections whose children are yielded.
+    """
+    section_tags = frozenset(section_tags)
+    # open elements, root first
+    stack = []
+    # the last element yielded, its tail is only read after its end event
+    yielded = None
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if yielded is not None:
+            if yielded.tail and not yielded.tail.strip():
+                yielded.tail = None
+            yielded = None
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.text and not elem.text.strip():
+            elem.text = None
+        for child in elem:
+            if child.tail and not child.tail.strip():
+                child.tail = None
+        if len(stack) == 2 and stack[1].tag in section_tags:
+            stack[1].remove(elem)
+            yielded = elem
+            yield stack[1].tag, elem
+        elif len(stack) == 1:
+            # a section of the root element has been read
+            stack[0].remove(elem)
+
+
+def load_template_child_elements_dict(
+    file_path, section_tags=("Types", "ExportedObjects"), as_strings=False
+):
+    """
+    Returns a dictionary of lists of the child elements of each section in section_tags,
+    streamed with iterparse_template_child_elements, eg
+    {'Types': [<Element 'ObjectType'>], 'ExportedObjects': [<Element 'OI'>]}.
+    Sections missing from the file have an empty list.
+
+    If as_strings is True the elements are kept as xml strings, which take less memory
+    than ElementTree Elements and are what ApplicationFactory compiles.
+    """
+    template_child_elements_dict = {tag: [] for tag in section_tags}
+    for tag, element in iterparse_template_child_elements(file_path, section_tags):
+        if as_strings:
+            element = ET.tostring(element, encoding="unicode")
+        template_child_elements_dict[tag].append(element)
+    return template_child_elements_dict
+
+
+def find_template_child_spans(data, section_tags=("Types", "ExportedObjects")):
+    """
+    Scans the bytes of an EBO export with expat, without building any tree, and returns
+    (encoding, spans), where spans is a dictionary of lists of the (start, end) byte
+    offsets of each child element of the sections named in section_tags (children of
+    the root ObjectSet element), eg {'Types': [(310, 5120)], 'ExportedObjects': [...]}.
+    encoding is the encoding declared by the file, utf-8 if none.
+
+    Parameters:
+    - data (bytes | mmap.mmap): The contents of the XML file.
+    - section_tags (Iterable[str]): Tags of the sections whose children are found.
+    """
+    # spans keep the order of section_tags, the set is only used to look tags up
+    spans = {tag: [] for tag in section_tags}
+    section_tags = frozenset(spans)
+    parser = expat.ParserCreate()
+    encoding = "utf-8"
+    depth = 0
+    # section and start offset of the child being read, and whether it has content
+    section = None
+    start = None
+    has_content = False
+
+    def xml_decl(version, declared_encoding, standalone):
+        nonlocal encoding
+        if declared_encoding:
+            encoding = declared_encoding
+
+    def start_element(name, attributes):
+        nonlocal depth, section, start, has_content
+        depth += 1
+        if depth == 2:
+            section = name if name in section_tags else None
+        elif depth == 3 and section is not None:
+            start = parser.CurrentByteIndex
+            has_content = False
+        else:
+            has_content = True
+
+    def end_element(name):
+        nonlocal depth
+        if depth == 3 and section is not None:
+            end = parser.CurrentByteIndex
+            # a self closing child ends where the event is reported, otherwise the event
+            # is reported at the start of the end tag
+            if has_content or data[end - 2 : end] != b"/>":
+                end = data.find(b">", end) + 1
+            spans[section].append((start, end))
+        depth -= 1
+
+    def character_data(text):
+        nonlocal has_content
+        has_content = True
+
+    parser.XmlDeclHandler = xml_decl
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    parser.Parse(data, True)
+    return encoding, spans
+
+
+def read_template_child_spans(file_path, section_tags=("Types", "ExportedObjects")):
+    """
+    Returns (spans, template_child_elements_dict): the byte offsets of the children of
+    each section in section_tags, see find_template_child_spans, and a dictionary of
+    lists of their exact xml text, read straight from the file. Files of at least
+    MMAP_MIN_BYTES are memory-mapped rather than read into memory.
+
+    The text is not parsed and serialized again, so entities, character references
+    (eg line breaks in attribute values) and layout are kept as in the file. Line
+    endings are normalized to "\n", as an XML parser would.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_BYTES:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = f.read()
+    try:
+        encoding, spans = find_template_child_spans(data, section_tags)
+        template_child_elements_dict = {
+            tag: [
+                data[start:end]
+                .decode(encoding)
+                .replace("\r\n", "\n")
+                .replace("\r", "\n")
+                for start, end in tag_spans
+            ]
+            for tag, tag_spans in spans.items()
+        }
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+    return spans, template_child_elements_dict
+
+
 def build_parent_map(tree):
     parent_map = {c: p for p in tree.iter() for c in p}
     return parent_map
@@ -91,44 +267,183 @@ def build_parent_map(tree):
 
 def find_child_elements_in_folder(file_path, folder_name=None):
     # parent_element_name='OI', parent_attributes={'TYPE': 'system.base.Folder', 'NAME': 'Variables'}
-    tree = ET.parse(file_path)
+    # a folder_name of None finds the folders without a NAME
+    return find_elements_in_folders(file_path, [folder_name])
 
-    child_elements = find_child_elements_in_xml(
-        file_path,
-        parent_element_name="OI",
-        parent_attributes={"TYPE": "system.base.Folder", "NAME": folder_name},
-    )
-    modified_child_elements = []
 
-    for child in child_elements:
-        child_copy = ET.Element(child.tag, child.attrib)
-        child_copy.attrib["FOLDER"] = folder_name
-        modified_child_elements.append(child_copy)
+def find_child_elements_in_folders(tree, folder_names):
+    """
+    Returns copies of the child elements of the folders named folder_names in an already
+    parsed XML tree, each with a FOLDER attribute set to the name of its folder.
+
+    All folders are found in one walk of the tree. Elements are grouped in the order of
+    folder_names, one group per entry (a name given twice has its elements twice), and
+    in document order within each folder.
+
+    Parameters:
+    - tree (ET.ElementTree | ET.Element): The parsed XML tree, or its root element.
+    - folder_names (Union[str, List[str]]): A single folder name or a list of folder names.
 
-    return modified_child_elements
+    Returns:
+    - List[ET.Element]: The copied child elements.
+    """
+    if isinstance(folder_names, str):
+        folder_names = [folder_names]
+    root = tree.getroot() if isinstance(tree, ET.ElementTree) else tree
+    groups = [(folder_name, []) for folder_name in folder_names]
+    groups_by_folder = {}
+    for group in groups:
+        groups_by_folder.setdefault(group[0], []).append(group)
+    for elem in root.iter("OI"):
+        if elem.get("TYPE") != "system.base.Folder":
+            continue
+        for folder_name, folder_elements in groups_by_folder.get(elem.get("NAME"), []):
+            for child in elem:
+                child_copy = ET.Element(child.tag, child.attrib)
+                child_copy.attrib["FOLDER"] = folder_name
+                folder_elements.append(child_copy)
+    all_elements = []
+    for _, folder_elements in groups:
+        all_elements.extend(folder_elements)
+    return all_elements
 
 
 def find_elements_in_folders(file_path, folder_names):
     """
     Finds and returns elements from specified folders within an XML file.
 
-    This function searches for child elements within specified folders by their names in an XML file. It handles both single folder names and lists of folder names. For each folder specified, it finds child elements that match the criteria and returns a combined list of these elements.
+    This function searches for child elements within specified folders by their names in an XML file. It handles both single folder names and lists of folder names. The file is parsed once and the children of every folder are collected in a single walk of the tree, see find_child_elements_in_folders.
 
     Parameters:
-    - file_path (str): The path to the XML file to be searched.
+    - file_path (str | ET.ElementTree | ET.Element): The path to the XML file to be searched, or an already parsed tree.
     - folder_names (Union[str, List[str]]): A single folder name or a list of folder names within the XML file from which to find child elements.
 
     Returns:
     - List[ET.Element]: A list of ElementTree.Element objects representing the found child elements within the specified folders.
     """
-    # Check if folder_names is a string and convert it to a list if so
-    if isinstance(folder_names, str):
-        folder_names = [folder_names]
-    all_elements = []
-    for folder_name in folder_names:
-        elements = find_child_elements_in_folder(file_path, folder_name)
-        all_elements.extend(elements)
-    return all_elements
+    if isinstance(file_path, (ET.ElementTree, ET.Element)):
+        tree = file_path
+    else:
+        tree = ET.parse(file_path)
+    return find_child_elements_in_folders(tree, folder_names)
+
+
+class TemplateIndex(object):
+    """
+    Lookup tables of the objects (OI elements) of an application template, built in a
+    single walk of the tree so queries do not rescan it:
+
+    - by_name: NAME -> list of elements with that name
+    - by_type: TYPE -> list of elements of that type
+    - by_path: path -> element, where the path is the NAMEs from the top level object
+      down, joined with "/", eg "Zoneworks XT Hive Controller 1/Alarms/Sum Alarm"
+    - children: element -> list of its child objects
+    - parent_map: element -> parent element, for every element including PI etc
+
+    elements is the list of the template's ExportedObjects child elements (minidom or
+    ElementTree Elements, or xml strings, as in template_child_elements_dict), or a
+    parsed export (ET.ElementTree or root Element) whose ExportedObjects are indexed, or
+    a single OI Element.
+    minidom Elements and xml strings are converted, so lookups return ElementTree
+    Elements.
+
+    Example:
+
+        index = TemplateIndex(ET.parse(template_path))
+        alarms = index.find_by_type_prefix("alarm.")
+        variables = index.get_children("Zoneworks XT Hive Controller 1/Variables")
+        element = index.get_element("Zoneworks XT Hive Controller 1/Variables/Flt")
+    """
+
+    def __init__(self, elements):
+        if isinstance(elements, ET.ElementTree):
+            elements = elements.getroot()
+        if isinstance(elements, ET.Element):
+            if elements.tag == "OI":
+                elements = [elements]
+            else:
+                if elements.tag != "ExportedObjects":
+                    elements = elements.find(".//ExportedObjects")
+                elements = [] if elements is None else list(elements)
+        self.roots = [to_etree(element) for element in elements]
+        self.by_name = {}
+        self.by_type = {}
+        self.by_path = {}
+        self.paths = {}
+        self.children = {}
+        self.parent_map = {}
+        stack = [(root, None, "") for root in reversed(self.roots)]
+        while stack:
+            element, parent, parent_path = stack.pop()
+            if parent is not None:
+                self.parent_map[element] = parent
+            if element.tag == "OI":
+                path = self.add_object(element, parent, parent_path)
+            else:
+                path = parent_path
+            stack.extend((child, element, path) for child in reversed(element))
+
+    def add_object(self, element, parent, parent_path):
+        """
+        adds an OI element to the lookup tables and returns its path.
+        """
+        name = element.get("NAME", "")
+        path = parent_path + "/" + name if parent_path else name
+        self.by_name.setdefault(name, []).append(element)
+        self.by_type.setdefault(element.get("TYPE"), []).append(element)
+        # the first object wins if two siblings have the same name
+        self.by_path.setdefault(path, element)
+        self.paths[element] = path
+        self.children[element] = []
+        if parent is not None and parent in self.children:
+            self.children[parent].append(element)
+        return path
+
+    def find_by_name(self, name):
+        return self.by_name.get(name, [])
+
+    def find_by_type(self, object_type):
+        return self.by_type.get(object_type, [])
+
+    def find_by_type_prefix(self, prefix):
+        """
+        returns the objects whose TYPE starts with prefix, eg "alarm." for all alarms,
+        in the order their types were first found.
+        """
+        return [
+            element
+            for object_type, elements in self.by_type.items()
+            if object_type and object_type.startswith(prefix)
+            for element in elements
+        ]
+
+    def get_element(self, path):
+        return self.by_path.get(path)
+
+    def get_path(self, element):
+        return self.paths.get(element)
+
+    def get_parent(self, element):
+        return self.parent_map.get(element)
+
+    def get_children(self, element_or_path):
+        """
+        returns the child objects of an object or of the object at a path, or an empty
+        list if there is no such object.
+        """
+        if isinstance(element_or_path, str):
+            element_or_path = self.by_path.get(element_or_path)
+        return self.children.get(element_or_path, [])
+
+    def iter_descendants(self, element_or_path):
+        """
+        yields every object below an object or the object at a path, in document order.
+        """
+        stack = list(reversed(self.get_children(element_or_path)))
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(reversed(self.children[element]))
 
 
 def write_elements_to_csv(elements, csv_file_path, attributes=None):
@@ -214,7 +529,7 @@ def find_and_clean_folder_elements(
     Finds child elements within specified folders in an XML file, cleans them, and returns them as a list of elements.
 
     Parameters:
-    - xml_file_path (str): The path to the XML file.
+    - xml_file_path (str | ET.ElementTree): The path to the XML file, or an already parsed tree.
     - folder_names (Union[str, List[str]]): A single folder name or a list of folder names within the XML file.
     - attributes (List[str]): A list of attribute names to keep in the cleaned elements.
 
@@ -223,7 +538,7 @@ def find_and_clean_folder_elements(
     """
     # Find elements in the specified folders
     elements = find_elements_in_folders(xml_file_path, folder_names)
-    print(f"Found {len(elements)} child elements in the folders")
+    report(f"Found {len(elements)} child elements in the folders")
 
     # Clean the elements and return the cleaned list
     cleaned_elements = clean_elements(elements, attributes)
@@ -250,7 +565,7 @@ def export_folder_elements_to_csv(
 
     # Find elements in the specified folders
     elements = find_and_clean_folder_elements(xml_file_path, folder_names, attributes)
-    print(f"Found {len(elements)} child elements in the folders")
+    report(f"Found {len(elements)} child elements in the folders")
 
     # If no CSV file path is provided, use the XML file path with a .csv extension
     if csv_file_path is None:
@@ -260,6 +575,18 @@ def export_folder_elements_to_csv(
     write_elements_to_csv(elements, csv_file_path)
 
 
+def iter_mustache_tags(text):
+    """
+    Yields (start, end, tag) for each mustache tag in text, in order, where
+    text[start:end] is the whole "{{tag}}" placeholder.
+
+    Parameters:
+    - text (str): eg the xml string of a template element.
+    """
+    for match in MUSTACHE_TAG_PATTERN.finditer(text):
+        yield match.start(), match.end(), match.group(1)
+
+
 def extract_mustache_tags_from_xml(xml_file_path):
     """
     Extracts a list of unique mustache tags from an XML file.
@@ -270,15 +597,12 @@ def extract_mustache_tags_from_xml(xml_file_path):
     Returns:
     - List[str]: A list of unique mustache tags found in the file.
     """
-    # Regular expression to find mustache tags
-    mustache_tag_pattern = r"{{(.*?)}}"
-
     # Read the content of the XML file
     with open(xml_file_path, "r", encoding="utf-8") as file:
         file_content = file.read()
 
     # Find all occurrences of mustache tags
-    found_tags = re.findall(mustache_tag_pattern, file_content)
+    found_tags = [tag for _, _, tag in iter_mustache_tags(file_content)]
 
     # Remove duplicates by converting the list to a set, then back to a list
     unique_tags = list(set(found_tags))
@@ -286,14 +610,31 @@ def extract_mustache_tags_from_xml(xml_file_path):
     return unique_tags
 
 
-def to_pretty_xml(obj):
+def to_pretty_xml(obj, cdata_tags=()):
     """
     Converts the XML object to a pretty-printed string.
     Returns:
         str: Pretty-printed XML string.
     """
-    rough = ET.tostring(obj, "utf-8")
-    return minidom.parseString(rough).toprettyxml(indent="  ")
+    stream = io.StringIO()
+    write_pretty_xml_document(stream, obj, cdata_tags=cdata_tags)
+    return stream.getvalue()
+
+
+def write_pretty_xml_document(stream, obj, cdata_tags=()):
+    """
+    Writes the XML declaration and the pretty-printed XML object to a text stream,
+    element by element, without building the whole document string in memory.
+
+    Parameters:
+    - stream (TextIO): eg a text file opened for writing.
+    - obj (ET.Element): The root element of the document.
+    - cdata_tags (Iterable[str]): Tags of elements whose text is written as a CDATA section.
+    """
+    stream.write(XML_DECLARATION + "\n")
+    write_pretty_xml(
+        stream.write, obj, addindent="  ", newl="\n", cdata_tags=frozenset(cdata_tags)
+    )
 
 
 def print_pretty_xml(obj):
@@ -305,19 +646,168 @@ def print_pretty_xml(obj):
     print(to_pretty_xml(obj))
 
 
-def convert_minidom_to_etree(minidom_element):
-    """Convert minidom element to ElementTree element, removing extra whitespace"""
-    # Get XML string without extra whitespace
-    xml_string = minidom_element.toxml()
+class RawXMLElement(ET.Element):
+    """
+    An ElementTree Element standing in for a pre-rendered xml fragment.
+
+    The fragment text is written as is by write_pretty_xml in place of the element, so
+    a copy rendered from a template can be handed to an EBOXMLBuilder without being
+    parsed. Only the tag is known, ElementTree functions such as ET.tostring will see
+    an empty element.
+    """
 
-    # Parse and remove whitespace
-    temp_element = ET.fromstring(xml_string)
+    def __init__(self, raw_xml, tag=None):
+        if tag is None:
+            match = TAG_PATTERN.match(raw_xml)
+            tag = match.group(1) if match else "RawXML"
+        super().__init__(tag)
+        self.raw_xml = raw_xml
 
-    # Remove whitespace from all elements
-    for elem in temp_element.iter():
+
+def to_pretty_xml_fragment(element, indent="", addindent="  ", cdata_tags=()):
+    """
+    Returns the pretty-printed xml of element, laid out for a position in a document
+    indented by indent, without the leading indent and trailing newline.
+    Wrapping the result in a RawXMLElement and writing it at that position gives the same
+    output as writing the element itself, so the element can be serialized once (eg in a
+    worker process) and then released.
+    """
+    stream = io.StringIO()
+    write_pretty_xml(
+        stream.write, element, indent, addindent, "\n", frozenset(cdata_tags)
+    )
+    return stream.getvalue()[len(indent) : -1]
+
+
+def indent_xml_fragment(fragment, indent):
+    """
+    Returns a fragment made by to_pretty_xml_fragment for indent "" laid out for a
+    position in a document indented by indent instead, by indenting every line after the
+    first. Returns None if the fragment has text or CDATA content spanning several lines,
+    as indenting it would change the content.
+    """
+    if not indent:
+        return fragment
+    if "<![CDATA[" in fragment or TEXT_LINE_BREAK_PATTERN.search(fragment):
+        return None
+    return fragment.replace("\n", "\n" + indent)
+
+
+def escape_xml_text(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_xml_attribute(value):
+    value = escape_xml_text(value)
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#9;")
+    return value
+
+
+def write_pretty_xml(
+    write, element, indent="", addindent="", newl="", cdata_tags=frozenset()
+):
+    """
+    Writes an ElementTree Element as pretty-printed xml, one write call per line or less.
+
+    The layout is the same as minidom toprettyxml, which was previously applied to the
+    output of ET.tostring: each element starts on its own line, an element containing
+    only text is written inline and empty elements are self closing (<PI Name="x"/>).
+    Newlines, tabs and carriage returns in attribute values are written as character
+    references so they survive re-import.
+    RawXMLElement fragments are written verbatim on their own line.
+    The text of elements with a tag in cdata_tags is written as a CDATA section.
+
+    Parameters:
+    - write (Callable[[str], Any]): eg the write method of a text file or io.StringIO.
+    - element (ET.Element): The element to write.
+    - indent (str): Indentation of the element.
+    - addindent (str): Indentation added for each level of children.
+    - newl (str): Newline string.
+    - cdata_tags (FrozenSet[str]): Tags of elements whose text is written as a CDATA section.
+    """
+    if isinstance(element, RawXMLElement):
+        write(indent + element.raw_xml + newl)
+        return
+    tag = element.tag
+    if tag is ET.Comment:
+        write("%s<!--%s-->%s" % (indent, element.text, newl))
+        return
+    parts = [indent, "<", tag]
+    for name, value in element.attrib.items():
+        parts.append(' %s="%s"' % (name, escape_xml_attribute(value)))
+    text = element.text
+    if not len(element):
+        if text and tag in cdata_tags:
+            cdata = text.replace("]]>", "]]]]><![CDATA[>")
+            parts.append("><![CDATA[%s]]></%s>%s" % (cdata, tag, newl))
+        elif text:
+            parts.append(">%s</%s>%s" % (escape_xml_text(text), tag, newl))
+        else:
+            parts.append("/>" + newl)
+        write("".join(parts))
+        return
+    parts.append(">" + newl)
+    write("".join(parts))
+    child_indent = indent + addindent
+    if text:
+        write(escape_xml_text(child_indent + text + newl))
+    for child in element:
+        write_pretty_xml(write, child, child_indent, addindent, newl, cdata_tags)
+        if child.tail:
+            write(escape_xml_text(child_indent + child.tail + newl))
+    write("%s</%s>%s" % (indent, tag, newl))
+
+
+def parse_xml_fragment(xml_string):
+    """
+    Parses an xml string to an ElementTree Element, removing whitespace only text and tails.
+    """
+    element = ET.fromstring(xml_string)
+    for elem in element.iter():
         if elem.text and not elem.text.strip():
             elem.text = None
         if elem.tail and not elem.tail.strip():
             elem.tail = None
+    return element
+
+
+def convert_minidom_to_etree(minidom_element):
+    """Convert minidom element to ElementTree element, removing extra whitespace"""
+    return parse_xml_fragment(minidom_element.toxml())
+
 
-    return temp_element
+def to_etree(element):
+    """
+    Converts a template element to an ElementTree Element.
+    Accepts a minidom Element, an ElementTree Element (returned as is) or an xml string.
+    """
+    if isinstance(element, ET.Element):
+        return element
+    if isinstance(element, str):
+        return parse_xml_fragment(element)
+    return convert_minidom_to_etree(element)
+
+
+def to_xml_string(element):
+    """
+    Serializes a template element to an xml string.
+    Accepts a minidom Element, an ElementTree Element or an xml string (returned as is).
+    """
+    if isinstance(element, str):
+        return element
+    if isinstance(element, ET.Element):
+        return ET.tostring(element, encoding="unicode")
+    return element.toxml()
@@ -1,5 +1,8 @@
+import io
 import os
+import xml.etree.ElementTree as ET
 from ebo_app_factory.ebo_xml_builder import EBOXMLBuilder
+from ebo_app_factory.xmlutils import RawXMLElement
 
 
 def test_create_xml_with_folders(tmp_path):
@@ -70,3 +73,47 @@ def test_create_hyperlink(tmp_path):
 
     # Check URL
     assert f'<PI Name="URL" Value="{url}"/>' in xml
+
+
+def test_to_pretty_xml_layout_and_raw_fragments():
+    builder = EBOXMLBuilder(ebo_version="6.0.4.90", server_full_path="/Server 1")
+    folder = builder.create_folder("Level 1", description="a & b")
+    folder.append(RawXMLElement('<OI NAME="Raw" TYPE="server.point.AV"/>'))
+    builder.add_to_exported_objects(folder)
+    script = ET.SubElement(folder, "PI", {"Name": "Code", "Value": "line 1\nline 2"})
+
+    xml = builder.to_pretty_xml()
+
+    assert xml.startswith('<?xml version="1.0" ?>\n<ObjectSet ExportMode="Special"')
+    assert (
+        '    <OI NAME="Level 1" TYPE="system.base.Folder" DESCR="a &amp; b">\n'
+        '      <OI NAME="Raw" TYPE="server.point.AV"/>\n'
+        '      <PI Name="Code" Value="line 1&#10;line 2"/>\n'
+        "    </OI>\n"
+    ) in xml
+    assert xml.endswith("</ObjectSet>\n")
+    # newlines in attribute values survive a round trip
+    assert ET.fromstring(xml.split("?>", 1)[1]).find(".//PI").get("Value") == (
+        script.get("Value")
+    )
+
+
+def test_write_xml_streams_same_document_as_to_pretty_xml(tmp_path):
+    builder = EBOXMLBuilder()
+    for i in range(3):
+        builder.add_to_exported_objects(builder.create_folder(f"Folder {i}"))
+    builder.CDATA_TAGS = ("Code",)
+    code = ET.SubElement(builder.exported_objects[0], "Code")
+    code.text = "a ]]> b"
+
+    stream = io.StringIO()
+    builder.write_xml_stream(stream)
+    output_path = os.path.join(tmp_path, "streamed.xml")
+    builder.write_xml(output_path)
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        assert f.read() == stream.getvalue() == builder.to_pretty_xml()
+    assert "<Code><![CDATA[a ]]]]><![CDATA[> b]]></Code>" in stream.getvalue()
+    assert ET.fromstring(stream.getvalue().split("?>", 1)[1]).find(".//Code").text == (
+        "a ]]> b"
+    )
@@ -0,0 +1,174 @@
+import os
+import shutil
+from ebo_app_factory.factory_cache import (
+    BuildManifest,
+    ObjectTypeCache,
+    RenderedCopyCache,
+    TemplateCache,
+)
+from ebo_app_factory.xml_app_factory import ApplicationFactory
+
+TEMPLATE_FILENAME = "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml"
+
+
+def test_template_cache_parses_each_file_once(tmp_path):
+    template_path = os.path.join(os.path.dirname(__file__), "data", TEMPLATE_FILENAME)
+    template_cache = TemplateCache()
+
+    first = template_cache.get_template_child_elements_dict(template_path)
+    # a different spelling of the same path shares the parsed template
+    second = template_cache.get_template_child_elements_dict(
+        os.path.join(
+            os.path.dirname(__file__), "..", "tests", "data", TEMPLATE_FILENAME
+        )
+    )
+
+    assert first is second
+    assert template_cache.parsed == 1
+    assert len(first["ExportedObjects"]) == 1
+    assert first["ExportedObjects"][0].startswith("<OI ")
+    assert len(first["Types"]) > 0
+
+
+def test_template_cache_persists_between_runs(tmp_path):
+    template_path = os.path.join(tmp_path, "template.xml")
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), "data", TEMPLATE_FILENAME),
+        template_path,
+    )
+    cache_dir = os.path.join(tmp_path, "cache")
+
+    elements = TemplateCache(cache_dir).get_template_child_elements_dict(template_path)
+
+    next_run = TemplateCache(cache_dir)
+    assert next_run.get_template_child_elements_dict(template_path) == elements
+    assert (next_run.parsed, next_run.loaded) == (0, 1)
+
+    # editing the template invalidates the cached copy
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+    with open(template_path, "w", encoding="utf-8") as f:
+        f.write(template.replace("ICG-L04M", "ICG-L05M"))
+    after_edit = TemplateCache(cache_dir)
+    changed = after_edit.get_template_child_elements_dict(template_path)
+    assert (after_edit.parsed, after_edit.loaded) == (1, 0)
+    assert "ICG-L05M" in changed["ExportedObjects"][0]
+
+
+def make_incremental_factory(tmp_path, copy_substrings):
+    template_path = os.path.join(os.path.dirname(__file__), "data", TEMPLATE_FILENAME)
+    template_cache = TemplateCache()
+    manifest = BuildManifest(os.path.join(tmp_path, "manifest.json"))
+    app_factory = ApplicationFactory(
+        template_child_elements_dict=template_cache.get_template_child_elements_dict(
+            template_path
+        ),
+        factory_placeholders={"ICGA": "ICG-L04M", "ICGB": "ICG_L04M"},
+        factory_copy_substrings=copy_substrings,
+        xml_out_file=os.path.join(tmp_path, "output.xml"),
+        show_progress=False,
+        manifest=manifest,
+    )
+    return (app_factory, manifest)
+
+
+def test_build_manifest_only_rewrites_changed_files(tmp_path):
+    copy_substrings = [
+        {"ICGA": f"ICG-L{i:02}", "ICGB": f"ICG_L{i:02}"} for i in range(6)
+    ]
+    output_files = [os.path.join(tmp_path, f"output_{i}.xml") for i in range(1, 4)]
+
+    app_factory, manifest = make_incremental_factory(tmp_path, copy_substrings)
+    app_factory.make_document(max_items_per_file=2)
+    assert manifest.written == output_files
+    assert os.path.exists(os.path.join(tmp_path, "manifest.json"))
+
+    # one row edited: only the file holding it is made again
+    copy_substrings[3] = {"ICGA": "ICG-L03M", "ICGB": "ICG_L03M"}
+    os.remove(output_files[2])
+    app_factory, manifest = make_incremental_factory(tmp_path, copy_substrings)
+    app_factory.make_document(max_items_per_file=2)
+    assert manifest.written == output_files[1:]
+    assert manifest.skipped == output_files[:1]
+    with open(output_files[1], "r", encoding="utf-8") as f:
+        assert "ICG-L03M" in f.read()
+
+    # a folder layout changes every file
+    app_factory, manifest = make_incremental_factory(tmp_path, copy_substrings)
+    app_factory.make_copies_in_folders("ICG_L04M")
+    app_factory.make_document(max_items_per_file=2)
+    assert manifest.written == output_files
+    assert not hasattr(app_factory, "factory_copies_dict")
+
+
+def test_rendered_copy_cache_reuses_copies_across_layouts(tmp_path):
+    template_path = os.path.join(os.path.dirname(__file__), "data", TEMPLATE_FILENAME)
+    copy_substrings = [
+        {"ICGA": f"ICG-L{i:02}", "ICGB": f"ICG_L{i:02}", "ICGC": f"L{i // 2}"}
+        for i in range(4)
+    ]
+    cache_file = os.path.join(tmp_path, "cache", "copies.sqlite")
+    outputs = {}
+    for name, copy_cache in (
+        ("uncached", None),
+        ("first", RenderedCopyCache(cache_file)),
+        ("second", RenderedCopyCache(cache_file)),
+    ):
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=TemplateCache().get_template_child_elements_dict(
+                template_path
+            ),
+            factory_placeholders={
+                "ICGA": "ICG-L04M",
+                "ICGB": "ICG_L04M",
+                "ICGC": "{{level}}",
+            },
+            factory_copy_substrings=copy_substrings,
+            xml_out_file=os.path.join(tmp_path, name + ".xml"),
+            show_progress=False,
+            copy_cache=copy_cache,
+        )
+        if name == "second":
+            # regrouping the same copies into folders only uses cached copies
+            app_factory.make_copies_in_folders("{{level}}")
+        app_factory.make_document()
+        with open(os.path.join(tmp_path, name + ".xml"), "r", encoding="utf-8") as f:
+            outputs[name] = f.read()
+        if copy_cache is not None:
+            copy_cache.close()
+
+    assert outputs["first"] == outputs["uncached"]
+    assert (copy_cache.hits, copy_cache.misses) == (4, 0)
+    assert '<OI NAME="L1" TYPE="system.base.Folder">' in outputs["second"]
+
+
+def test_rendered_copy_cache_evicts_least_recently_used(tmp_path):
+    copy_cache = RenderedCopyCache(
+        os.path.join(tmp_path, "copies.sqlite"), max_bytes=10
+    )
+    copy_cache.put("a", "<a/>")
+    copy_cache.put("b", "<b/>")
+    copy_cache.flush()
+    assert copy_cache.get("a") == "<a/>"
+    copy_cache.put("c", "<c/>")
+    copy_cache.flush()
+
+    assert copy_cache.get("b") is None
+    assert copy_cache.get("a") == "<a/>"
+    assert copy_cache.get("c") == "<c/>"
+    copy_cache.close()
+
+
+def test_object_type_cache_converts_each_type_once():
+    template_path = os.path.join(os.path.dirname(__file__), "data", TEMPLATE_FILENAME)
+    types = TemplateCache().get_template_child_elements_dict(template_path)["Types"]
+    type_cache = ObjectTypeCache()
+
+    object_types = type_cache.get_object_types(types)
+    # the same types from another template are the same fragments, deduplicated by Name
+    again = type_cache.get_object_types(list(types) + [str(t) for t in types])
+
+    assert len(object_types) == len(types)
+    assert again == object_types
+    assert type_cache.converted == len(types)
+    assert object_types[0].raw_xml.startswith("<ObjectType Name=")
@@ -0,0 +1,71 @@
+import os
+from ebo_app_factory.instrumentation import Tracer
+from ebo_app_factory.xml_app_factory import ApplicationFactory, ApplicationTemplate
+
+
+def test_tracer_times_nested_stages():
+    events = []
+    tracer = Tracer(callback=events.append)
+
+    with tracer.stage("outer", rows=2):
+        with tracer.timer("parsing"):
+            pass
+        with tracer.stage("inner"):
+            with tracer.timer("serialization"):
+                pass
+            tracer.progress(1, 2)
+
+    assert [(e["event"], e.get("stage")) for e in events] == [
+        ("stage_start", "outer"),
+        ("stage_start", "inner"),
+        ("progress", "inner"),
+        ("stage_end", "inner"),
+        ("stage_end", "outer"),
+    ]
+    inner_end, outer_end = events[3], events[4]
+    assert list(inner_end["timings"]) == ["serialization"]
+    # time in a nested stage counts towards the outer stage too
+    assert sorted(outer_end["timings"]) == ["parsing", "serialization"]
+    assert outer_end["rows"] == 2
+    assert outer_end["seconds"] >= inner_end["seconds"]
+    assert tracer.events == []
+
+
+def test_application_factory_emits_build_events(tmp_path):
+    template_path = os.path.join(
+        os.path.dirname(__file__),
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    app_template = ApplicationTemplate(template_path)
+    tracer = Tracer()
+    app_factory = ApplicationFactory(
+        template_child_elements_dict=app_template.template_child_elements_dict,
+        factory_placeholders={"ICGA": "ICG-L04M"},
+        factory_copy_substrings=[{"ICGA": f"ICG-L{i:02}"} for i in range(3)],
+        xml_out_file=os.path.join(tmp_path, "output.xml"),
+        show_progress=False,
+        tracer=tracer,
+    )
+
+    app_factory.make_document(max_items_per_file=2)
+
+    stage_ends = [e for e in tracer.events if e["event"] == "stage_end"]
+    assert [e["stage"] for e in stage_ends] == [
+        "write_xml",
+        "write_xml",
+        "make_document",
+    ]
+    assert sorted(stage_ends[-1]["timings"]) == [
+        "parsing",
+        "serialization",
+        "substitution",
+    ]
+    files_written = [e for e in tracer.events if e["event"] == "file_written"]
+    assert [os.path.basename(e["file"]) for e in files_written] == [
+        "output_1.xml",
+        "output_2.xml",
+    ]
+    assert files_written[0]["bytes"] == os.path.getsize(files_written[0]["file"])
+    progress = [e for e in tracer.events if e["event"] == "progress"]
+    assert progress[-1]["done"] == progress[-1]["total"]
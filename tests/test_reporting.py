@@ -0,0 +1,49 @@
+import logging
+import pytest
+from ebo_app_factory import reporting
+from ebo_app_factory.ebo_xml_builder import EBOXMLBuilder
+from ebo_app_factory.reporting import ProgressReporter, configure_reporting, report
+
+
+@pytest.fixture(autouse=True)
+def restore_reporting_settings():
+    settings = dict(reporting.settings)
+    yield
+    reporting.settings.update(settings)
+
+
+def test_progress_reporter_is_rate_limited(capsys):
+    configure_reporting(min_interval=0, min_percent=10)
+    progress_reporter = ProgressReporter()
+
+    for step in range(1, 1001):
+        progress_reporter.update(step, 1000)
+
+    written = capsys.readouterr().out.split("\r")[1:]
+    assert written == ["%d%%" % percent for percent in range(0, 101, 10)]
+
+    # a new loop starts from the beginning
+    progress_reporter.update(1, 4)
+    assert capsys.readouterr().out == "\r25%"
+
+
+def test_reporting_can_be_logged_or_turned_off(tmp_path, capsys, caplog):
+    builder = EBOXMLBuilder()
+
+    configure_reporting(use_logging=True)
+    with caplog.at_level(logging.DEBUG, logger="ebo_app_factory"):
+        builder.write_xml(tmp_path / "output.xml")
+        report("detail", level=logging.DEBUG)
+    assert capsys.readouterr().out == ""
+    assert [record.getMessage() for record in caplog.records] == [
+        f"XML written to {tmp_path / 'output.xml'}",
+        "detail",
+    ]
+
+    caplog.clear()
+    configure_reporting(enabled=False)
+    with caplog.at_level(logging.DEBUG, logger="ebo_app_factory"):
+        builder.write_xml(tmp_path / "output.xml")
+        ProgressReporter().update(1, 1)
+    assert capsys.readouterr().out == ""
+    assert caplog.records == []
@@ -0,0 +1,115 @@
+import pytest
+from ebo_app_factory.template_compiler import (
+    AhoCorasickMatcher,
+    CompiledTemplate,
+    escape_ampersands,
+)
+
+
+def test_render_replaces_placeholders_in_column_order():
+    compiled = CompiledTemplate(
+        '<OI NAME="VAV-L21-INT4"><PI Name="Bind" Value="../L21-INT4/Zn"/></OI>',
+        ["VAV-L21-INT4", "L21-INT4"],
+    )
+
+    rendered = compiled.render(["VAV-L04-INT09", "L04_INT09"])
+
+    assert (
+        rendered
+        == '<OI NAME="VAV-L04-INT09"><PI Name="Bind" Value="../L04_INT09/Zn"/></OI>'
+    )
+
+
+def test_render_skips_none_values_like_sequential_replace():
+    compiled = CompiledTemplate("VAV-L21-INT4 L21-INT4", ["VAV-L21-INT4", "L21-INT4"])
+
+    # column A is blank, so column B also matches inside the untouched column A placeholder
+    assert compiled.render([None, "L04"]) == "VAV-L04 L04"
+    assert compiled.render(["X", None]) == "X L21-INT4"
+
+
+def test_render_does_not_rescan_replacement_values():
+    compiled = CompiledTemplate("<a>{{name}}</a>", ["{{name}}", "{{level}}"])
+
+    assert compiled.render(["{{level}}", "L04"]) == "<a>{{level}}</a>"
+
+
+def test_render_escapes_ampersands_and_converts_values_to_str():
+    compiled = CompiledTemplate('<a N="X" V="Y"/>', ["X", "Y"])
+
+    assert compiled.render(["R&D", 5]) == '<a N="R&amp;D" V="5"/>'
+    assert escape_ampersands("A &amp; B & C") == "A &amp; B &amp; C"
+
+
+def test_render_ignores_empty_placeholders():
+    compiled = CompiledTemplate("<a>X</a>", [None, "", "X"])
+
+    assert compiled.render(["1", "2", "3"]) == "<a>3</a>"
+
+
+def test_render_batch_matches_render_for_each_row():
+    compiled = CompiledTemplate("VAV-L21-INT4 L21-INT4 &", ["VAV-L21-INT4", "L21-INT4"])
+    rows = [["VAV-1", "L1"], [None, "L2"], ["R&D", None], ["VAV-4", 4]]
+
+    expected = [compiled.render(values) for values in rows]
+    assert compiled.render_rows(rows) == expected
+    assert compiled.render_batch(list(zip(*rows))) == expected
+    assert compiled.render_rows(rows[:1] + rows[3:]) == [expected[0], expected[3]]
+    assert compiled.render_rows([]) == []
+
+    with pytest.raises(ValueError):
+        compiled.render_batch([["VAV-1", "VAV-2"], ["L1"]])
+
+
+def test_aho_corasick_matcher_finds_every_placeholder_in_one_scan():
+    matcher = AhoCorasickMatcher(["VAV-L21-INT4", "L21-INT4", None, "INT"])
+
+    assert sorted(matcher.find_all("VAV-L21-INT4 L21-INT4")) == [
+        (0, 0),
+        (4, 1),
+        (8, 3),
+        (13, 1),
+        (17, 3),
+    ]
+
+
+def test_sequential_matching_keeps_column_order_precedence():
+    template = "VAV-L21-INT4 L21-INT4 {{level}}"
+    placeholders = ["L21-INT4", "VAV-L21-INT4", "{{level}}"]
+    compiled = CompiledTemplate(template, placeholders)
+    sequential = CompiledTemplate(template, placeholders, matching="sequential")
+
+    for values in (["X", "Y", "{{level}}"], [None, "Y", "L04"], ["X", None, None]):
+        assert sequential.render(values) == compiled.render(values)
+    assert sequential.render(["X", "Y", "L04"]) == "VAV-X X L04"
+
+
+def test_longest_matching_replaces_the_longest_placeholder():
+    compiled = CompiledTemplate(
+        "VAV-L21-INT4 L21-INT4", ["L21-INT4", "VAV-L21-INT4"], matching="longest"
+    )
+
+    assert compiled.render(["X", "Y"]) == "Y X"
+    # an inactive placeholder does not stop shorter ones from matching
+    assert compiled.render(["X", None]) == "VAV-X X"
+    assert compiled.render_rows([["X", "Y"], ["Z", "W"]]) == ["Y X", "W Z"]
+
+    with pytest.raises(ValueError):
+        CompiledTemplate("X", ["X"], matching="shortest")
+
+
+def test_mustache_matching_fills_whole_tags_by_column():
+    compiled = CompiledTemplate(
+        '<OI NAME="{{name}}" DESCR="{{name}} on {{level}} {{note}}" X="level"/>',
+        ["{{level}}", "level", "{{name}}", "{{level}}"],
+        matching="mustache",
+    )
+
+    # plain text headers are never matched, a repeated header uses its first column
+    assert (
+        compiled.render(["L04", "X", "VAV-1", "L05"])
+        == '<OI NAME="VAV-1" DESCR="VAV-1 on L04 {{note}}" X="level"/>'
+    )
+    assert compiled.render_rows([["L04", "X", None, "L05"]]) == [
+        '<OI NAME="{{name}}" DESCR="{{name}} on L04 {{note}}" X="level"/>'
+    ]
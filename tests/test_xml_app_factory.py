@@ -1,9 +1,24 @@
+import csv
 import os
+import pickle
+import pytest
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+import openpyxl
+from ebo_app_factory.factory_cache import BuildManifest
 from ebo_app_factory.xml_app_factory import (
     ApplicationFactory,
     ApplicationFactoryManager,
     ApplicationTemplate,
+    FactoryInputsFromCsv,
     FactoryInputsFromSpreadsheet,
+    FactoryRow,
+    collect_factory_inputs,
+    index_copies_by_folder,
+    iter_sized_chunks,
+    split_sizes_evenly,
 )
 
 
@@ -121,3 +136,695 @@ def test_application_factory_creates_xml(tmp_path):
     assert (
         len(xml_files) == 8
     ), f"Expected 8 XML files, but found {len(xml_files)}: {xml_files}"
+
+
+def test_application_factory_copies_without_validation(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+    app_template = ApplicationTemplate(template_path)
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=item_workbook_path, sheetname="ICG"
+    )
+
+    documents = []
+    for validate_copies in (True, False):
+        output_xml_path = os.path.join(tmp_path, f"output_{validate_copies}.xml")
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders=factory_inputs.factory_placeholders,
+            factory_copy_substrings=factory_inputs.factory_copy_substrings,
+            xml_out_file=output_xml_path,
+            validate_copies=validate_copies,
+            show_progress=False,
+        )
+        app_factory.make_document()
+        with open(output_xml_path, "r", encoding="utf-8") as f:
+            documents.append(ET.fromstring(f.read()))
+
+    # unvalidated copies are written as rendered text but parse to the same objects
+    validated, unvalidated = documents
+    names = [oi.get("NAME") for oi in validated.find("ExportedObjects")]
+    assert names == [oi.get("NAME") for oi in unvalidated.find("ExportedObjects")]
+    assert len(names) == 16
+    assert "ICG-B01" in names
+
+
+def test_application_factory_make_copies_in_workers_keeps_order(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+    app_template = ApplicationTemplate(template_path)
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=item_workbook_path, sheetname="IT1"
+    )
+
+    documents = []
+    for workers in (None, 2):
+        output_xml_path = os.path.join(tmp_path, f"output_{workers}.xml")
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders=factory_inputs.factory_placeholders,
+            factory_copy_substrings=factory_inputs.factory_copy_substrings,
+            xml_out_file=output_xml_path,
+            workers=workers,
+            show_progress=False,
+        )
+        app_factory.make_document()
+        with open(output_xml_path, "r", encoding="utf-8") as f:
+            documents.append(f.read())
+
+    # copies made across worker processes come back in spreadsheet order
+    assert documents[0] == documents[1]
+    assert "IT1-L08" in documents[1]
+
+
+def test_application_factory_make_document_streams_worker_copies(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+    app_template = ApplicationTemplate(template_path)
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=item_workbook_path, sheetname="ICG"
+    )
+
+    documents = []
+    for workers in (None, 2):
+        output_dir = os.path.join(tmp_path, str(workers))
+        os.mkdir(output_dir)
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders=factory_inputs.factory_placeholders,
+            factory_copy_substrings=factory_inputs.factory_copy_substrings,
+            xml_out_file=os.path.join(output_dir, "output.xml"),
+            workers=workers,
+            manifest=BuildManifest(os.path.join(tmp_path, f"manifest_{workers}.json")),
+            show_progress=False,
+        )
+        # batches that start and end part way through a row
+        app_factory.BATCH_SIZE = 4
+        batch_sizes = []
+        make_copies_in_workers = app_factory.make_copies_in_workers
+
+        def record_batch(elements, factory_copy_substrings, depth):
+            batch_sizes.append(len(factory_copy_substrings))
+            return make_copies_in_workers(elements, factory_copy_substrings, depth)
+
+        app_factory.make_copies_in_workers = record_batch
+        app_factory.make_document(max_items_per_file=3)
+        files = {}
+        for filename in sorted(os.listdir(output_dir)):
+            with open(os.path.join(output_dir, filename), "r", encoding="utf-8") as f:
+                files[filename] = f.read()
+        documents.append(files)
+
+    # the workers make the copies a batch at a time, also with a manifest, and the
+    # copies are never all made at once by make_copies
+    assert not hasattr(app_factory, "factory_copies_dict")
+    assert batch_sizes and max(batch_sizes) <= 3
+    assert documents[0] == documents[1]
+    assert len(documents[1]) > 1
+
+
+def test_application_factory_manager_makes_documents_in_workers(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template1_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    template2_path = os.path.join(
+        test_dir, "data", "Zoneworks XT Hive Controller 1 EBO app Export 2024-04-19.xml"
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+
+    outputs = []
+    converted_types = []
+    for workers in (None, 3):
+        output_dir = os.path.join(tmp_path, str(workers))
+        os.mkdir(output_dir)
+        app_factory_manager = ApplicationFactoryManager(
+            template_map={
+                "ICG": {"templateFilename": template1_path},
+                "ISD": {"templateFilename": template1_path},
+                "controllers": {"templateFilename": template2_path},
+            },
+            xlfile=item_workbook_path,
+            sheetname=["ICG", "ISD", "controllers"],
+            max_items_per_file=4,
+            xml_out_file_prefix=os.path.join(output_dir, "output"),
+            workers=workers,
+        )
+        app_factory_manager.make_documents()
+        converted_types.append(app_factory_manager.type_cache.converted)
+        files = {}
+        for filename in sorted(os.listdir(output_dir)):
+            with open(os.path.join(output_dir, filename), "r", encoding="utf-8") as f:
+                files[filename] = f.read()
+        outputs.append(files)
+
+    # same files with the same content, whichever process made them
+    assert outputs[0] == outputs[1]
+    # each file has each ObjectType once, converted once per run
+    all_names = set()
+    for xml_content in outputs[0].values():
+        names = [t.get("Name") for t in ET.fromstring(xml_content).find("Types")]
+        assert names and len(names) == len(set(names))
+        all_names.update(names)
+    assert converted_types[0] == len(all_names)
+    assert "output_ISD_3.xml" in outputs[1]
+    assert "output_controllers_2.xml" in outputs[1]
+
+
+def test_application_factory_manager_skips_unchanged_documents(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+    manifest_file = os.path.join(tmp_path, "manifest.json")
+
+    records = []
+    for workers in (None, 2, None):
+        manifest = BuildManifest(manifest_file)
+        app_factory_manager = ApplicationFactoryManager(
+            template_map={"ISD": {"templateFilename": template_path}},
+            xlfile=item_workbook_path,
+            sheetname="ISD",
+            max_items_per_file=4,
+            xml_out_file_prefix=os.path.join(tmp_path, "output"),
+            workers=workers,
+            manifest=manifest,
+        )
+        if records:
+            # a changed setting makes every file again
+            app_factory_manager.factory_settings["ebo_version"] = "6.0.4.90"
+        app_factory_manager.make_documents()
+        records.append((len(manifest.written), len(manifest.skipped)))
+
+    assert records == [(3, 0), (3, 0), (0, 3)]
+
+
+MANIFEST_HASH_SCRIPT = """
+import json, sys
+from ebo_app_factory.factory_cache import BuildManifest
+from ebo_app_factory.xml_app_factory import ApplicationFactoryManager
+
+template_path, item_workbook_path, xml_out_file_prefix = sys.argv[1:]
+manifest = BuildManifest()
+ApplicationFactoryManager(
+    template_map={"ISD": {"templateFilename": template_path}},
+    xlfile=item_workbook_path,
+    sheetname="ISD",
+    max_items_per_file=4,
+    xml_out_file_prefix=xml_out_file_prefix,
+    manifest=manifest,
+    show_progress=False,
+).make_documents()
+print(json.dumps([inputs_hash for _, inputs_hash, _ in manifest.records]))
+"""
+
+
+def test_manifest_hash_does_not_depend_on_hash_seed(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+    src_dir = os.path.join(os.path.dirname(test_dir), "src")
+
+    hashes = []
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [src_dir] + [p for p in [env.get("PYTHONPATH")] if p]
+        )
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                MANIFEST_HASH_SCRIPT,
+                template_path,
+                item_workbook_path,
+                os.path.join(tmp_path, "output_" + seed),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        hashes.append(result.stdout)
+
+    # a later run, in another process, skips the unchanged files
+    assert hashes[0] and hashes[0] == hashes[1]
+
+
+def test_factory_inputs_from_spreadsheet_streams_rows(tmp_path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "VAV"
+    sheet.append(["VAV-L21-INT4", "L21-INT4", None])
+    sheet.append(["VAV-L04-INT09", "L04_INT09", "spare"])
+    sheet.append([])
+    sheet.append(["VAV-L05-INT01", None, None])
+    workbook.create_sheet("meta").append(["ignored"])
+    xlfile = os.path.join(tmp_path, "items.xlsx")
+    workbook.save(xlfile)
+
+    factory_inputs = FactoryInputsFromSpreadsheet(xlfile=xlfile)
+
+    assert factory_inputs.factory_placeholders == {
+        "VAVA": "VAV-L21-INT4",
+        "VAVB": "L21-INT4",
+        "VAVC": None,
+    }
+    assert factory_inputs.factory_copy_substrings == [
+        {"VAVA": "VAV-L04-INT09", "VAVB": "L04_INT09", "VAVC": "spare"},
+        {"VAVA": None, "VAVB": None, "VAVC": None},
+        {"VAVA": "VAV-L05-INT01", "VAVB": None, "VAVC": None},
+    ]
+    assert factory_inputs.factory_copy_substrings_sorted == {
+        "VAV": factory_inputs.factory_copy_substrings
+    }
+
+
+def test_factory_inputs_from_csv_matches_spreadsheet(tmp_path, capsys):
+    item_workbook_path = os.path.join(os.path.dirname(__file__), "data", "items.xlsx")
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=item_workbook_path, sheetname=["ICG", "controllers"]
+    )
+    # export each sheet as a csv file, as a CMMS would
+    csv_dir = os.path.join(tmp_path, "csv")
+    os.mkdir(csv_dir)
+    workbook = openpyxl.load_workbook(item_workbook_path, data_only=True)
+    for sheetname, delimiter, extension in (
+        ("ICG", ",", ".csv"),
+        ("controllers", "\t", ".tsv"),
+        ("meta-LEVELS", ",", ".csv"),
+    ):
+        path = os.path.join(csv_dir, sheetname + extension)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            for row in workbook[sheetname].iter_rows(values_only=True):
+                writer.writerow(["" if value is None else value for value in row])
+
+    capsys.readouterr()
+    csv_inputs = FactoryInputsFromCsv(csv_dir, show_progress=False)
+
+    assert capsys.readouterr().out == ""
+
+    assert list(csv_inputs.factory_copy_substrings_sorted) == ["ICG", "controllers"]
+    assert csv_inputs.factory_placeholders == factory_inputs.factory_placeholders
+    assert csv_inputs.factory_copy_substrings_sorted == (
+        factory_inputs.factory_copy_substrings_sorted
+    )
+
+
+def test_collect_factory_inputs_shares_row_index():
+    keys = ("VAVA", "VAVB")
+    placeholders, rows = collect_factory_inputs(
+        [
+            (keys, ("VAV-L21-INT4", "L21-INT4")),
+            (keys, ("VAV-L04-INT09", "L04_INT09")),
+            (keys, ("VAV-L05-INT01", None)),
+        ]
+    )
+
+    assert placeholders == {"VAVA": "VAV-L21-INT4", "VAVB": "L21-INT4"}
+    assert all(isinstance(row, FactoryRow) for row in rows)
+    assert rows[0].index is rows[1].index
+    assert rows[0]["VAVB"] == "L04_INT09"
+    assert rows[1].get("VAVC", "missing") == "missing"
+    # rows are still mappings
+    assert list(rows[0].values()) == ["VAV-L04-INT09", "L04_INT09"]
+    assert dict(rows[1].items()) == {"VAVA": "VAV-L05-INT01", "VAVB": None}
+    assert rows == [
+        {"VAVA": "VAV-L04-INT09", "VAVB": "L04_INT09"},
+        {"VAVA": "VAV-L05-INT01", "VAVB": None},
+    ]
+    # rows are sent to worker processes
+    assert pickle.loads(pickle.dumps(rows)) == rows
+
+    factory = ApplicationFactory(
+        template_child_elements_dict={"Types": [], "ExportedObjects": []},
+        factory_placeholders={"VAVB": "L21-INT4", "VAVA": "VAV-L21-INT4"},
+        factory_copy_substrings=rows,
+        xml_out_file=None,
+    )
+    assert factory.get_copy_values(rows[1]) == [None, "VAV-L05-INT01"]
+    assert factory.get_copy_values({"VAVA": "VAV-L06"}) == [None, "VAV-L06"]
+
+
+def test_index_copies_by_folder_groups_rows_in_order():
+    rows = [
+        {"A": "VAV-1", "B": "L02", "C": "East"},
+        {"A": "VAV-2", "B": "L01", "C": "West"},
+        {"A": "VAV-3", "B": "L02", "C": None},
+        {"A": "VAV-4", "B": None, "C": "East"},
+        {"A": "VAV-5", "B": "L02", "C": "East"},
+        {"X": "other sheet"},
+    ]
+
+    folder_index = index_copies_by_folder(rows, ["B", "C"])
+
+    assert folder_index["size"] == 5
+    assert folder_index["copies"] == [rows[3]]
+    assert list(folder_index["folders"]) == ["L02", "L01"]
+    level_2 = folder_index["folders"]["L02"]
+    assert level_2["copies"] == [rows[2]]
+    assert level_2["folders"] == {"East": {"copies": [rows[0], rows[4]], "folders": {}}}
+    assert folder_index["folders"]["L01"]["folders"]["West"]["copies"] == [rows[1]]
+
+
+def test_application_factory_makes_nested_copies_in_folders(tmp_path):
+    template_path = os.path.join(
+        os.path.dirname(__file__),
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    app_template = ApplicationTemplate(template_path)
+    app_factory = ApplicationFactory(
+        template_child_elements_dict=app_template.template_child_elements_dict,
+        factory_placeholders={"ICGA": "ICG-L04M", "ICGB": "ICG_L04M"},
+        factory_copy_substrings=[
+            {"ICGA": "ICG-L01", "ICGB": "B1"},
+            {"ICGA": "ICG-B01", "ICGB": "B1"},
+            {"ICGA": "ICG-L02", "ICGB": "T1"},
+        ],
+        xml_out_file=os.path.join(tmp_path, "output.xml"),
+        show_progress=False,
+    )
+
+    app_factory.make_copies_in_folders(["ICG_L04M", "ICG-L04M"])
+
+    buildings = app_factory.factory_copies_dict["ExportedObjects"]
+    assert [folder.get("NAME") for folder in buildings] == ["B1", "T1"]
+    assert [folder.get("NAME") for folder in buildings[0]] == ["ICG-L01", "ICG-B01"]
+    assert buildings[0][1][0].get("NAME") == "ICG-B01"
+
+    with pytest.raises(ValueError):
+        app_factory.make_copies_in_folders("{{level}}")
+
+
+def test_application_factory_streams_copies_to_files(tmp_path):
+    template_path = os.path.join(
+        os.path.dirname(__file__),
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    app_template = ApplicationTemplate(template_path)
+    factory_copy_substrings = [
+        {"ICGA": f"ICG-L{i:02}", "ICGB": f"B{i % 2}"} for i in range(5)
+    ]
+
+    documents = []
+    for premade in (True, False):
+        output_dir = os.path.join(tmp_path, str(premade))
+        os.mkdir(output_dir)
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders={"ICGA": "ICG-L04M", "ICGB": "ICG_L04M"},
+            factory_copy_substrings=factory_copy_substrings,
+            xml_out_file=os.path.join(output_dir, "output.xml"),
+            show_progress=False,
+        )
+        if premade:
+            app_factory.make_copies()
+            app_factory.make_document(max_items_per_file=2)
+        else:
+            app_factory.make_document(max_items_per_file=2)
+            # copies were made one file at a time, never all together
+            assert not hasattr(app_factory, "factory_copies_dict")
+        files = {}
+        for filename in sorted(os.listdir(output_dir)):
+            with open(os.path.join(output_dir, filename), "r", encoding="utf-8") as f:
+                files[filename] = f.read()
+        documents.append(files)
+
+    assert documents[0] == documents[1]
+    assert sorted(documents[1]) == ["output_1.xml", "output_2.xml", "output_3.xml"]
+
+    # folder_placeholder streams the copies of make_copies_in_folders
+    app_factory.xml_out_file = os.path.join(tmp_path, "folders.xml")
+    app_factory.make_document(folder_placeholder="ICG_L04M")
+    root = ET.parse(app_factory.xml_out_file).getroot()
+    assert [folder.get("NAME") for folder in root.find("ExportedObjects")] == [
+        "B0",
+        "B1",
+    ]
+    assert not hasattr(app_factory, "factory_copies_dict")
+
+
+def test_iter_sized_chunks_and_split_sizes_evenly():
+    chunks = list(iter_sized_chunks(["aa", "bbb", "c", "dddddd", "e"], max_bytes=5))
+    assert chunks == [
+        (["aa", "bbb"], False),
+        (["c"], False),
+        (["dddddd"], False),
+        (["e"], True),
+    ]
+    assert list(iter_sized_chunks("abc", max_items=2)) == [
+        (["a", "b"], False),
+        (["c"], True),
+    ]
+    assert list(iter_sized_chunks([], max_bytes=5)) == [([], True)]
+
+    assert split_sizes_evenly([10, 10, 10, 30], 2) == [3, 1]
+    assert split_sizes_evenly([5] * 9, 3) == [3, 3, 3]
+    assert split_sizes_evenly([1, 1], 4) == [1, 1]
+
+
+def test_application_factory_splits_files_by_size(tmp_path):
+    template_path = os.path.join(
+        os.path.dirname(__file__),
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    app_template = ApplicationTemplate(template_path)
+
+    def make_document(name, **kwargs):
+        output_dir = os.path.join(tmp_path, name)
+        os.mkdir(output_dir)
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders={"ICGA": "ICG-L04M"},
+            factory_copy_substrings=[{"ICGA": f"ICG-L{i:02}"} for i in range(6)],
+            xml_out_file=os.path.join(output_dir, "output.xml"),
+            show_progress=False,
+        )
+        app_factory.make_document(**kwargs)
+        files = {}
+        for filename in sorted(os.listdir(output_dir)):
+            with open(os.path.join(output_dir, filename), "r", encoding="utf-8") as f:
+                files[filename] = f.read()
+        return files
+
+    def get_exported_objects(xml_content):
+        # the lines of the ExportedObjects children
+        lines = xml_content.splitlines(keepends=True)
+        start = lines.index("  <ExportedObjects>\n") + 1
+        return "".join(lines[start : lines.index("  </ExportedObjects>\n")])
+
+    (document,) = make_document("default").values()
+    copy_size = len(get_exported_objects(document).encode("utf-8")) // 6
+
+    # a byte limit larger than the document makes the same single file
+    assert make_document("large", max_bytes_per_file=100 * copy_size) == {
+        "output.xml": document
+    }
+
+    files = make_document("sized", max_bytes_per_file=int(copy_size * 2.5))
+    assert sorted(files) == ["output_1.xml", "output_2.xml", "output_3.xml"]
+    for xml_content in files.values():
+        assert len(get_exported_objects(xml_content).encode("utf-8")) <= 2.5 * copy_size
+    assert "".join(get_exported_objects(f) for f in files.values()) == (
+        get_exported_objects(document)
+    )
+
+    files = make_document("balanced", number_of_files=4)
+    assert sorted(files) == [f"output_{i}.xml" for i in range(1, 5)]
+    counts = [len(ET.fromstring(f).find("ExportedObjects")) for f in files.values()]
+    assert sorted(counts) == [1, 1, 2, 2]
+
+    with pytest.raises(ValueError):
+        make_document("invalid", number_of_files=2, max_items_per_file=2)
+
+
+def test_streaming_application_template_makes_the_same_document(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=os.path.join(test_dir, "data", "items.xlsx")
+    )
+
+    documents = []
+    for streaming in (False, True):
+        app_template = ApplicationTemplate(template_path, streaming=streaming)
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders=factory_inputs.factory_placeholders,
+            factory_copy_substrings=factory_inputs.factory_copy_substrings,
+            xml_out_file=os.path.join(tmp_path, f"output_{streaming}.xml"),
+            show_progress=False,
+        )
+        app_factory.make_copies_in_folders("ICG-L04M")
+        app_factory.make_document(write_result=False)
+        documents.append(app_factory.xml_builder.to_pretty_xml())
+
+    assert app_template.xml_in_doc is None
+    assert all(
+        isinstance(element, ET.Element)
+        for elements in app_template.template_child_elements_dict.values()
+        for element in elements
+    )
+    # line breaks in attribute values are kept as character references, minidom writes
+    # them raw so they were read back as spaces
+    assert "&#13;&#10;" in documents[1]
+    assert documents[0] == re.sub("&#13;&#10;|&#10;|&#13;", " ", documents[1])
+
+
+def test_raw_application_template_slices_children_from_the_file(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=os.path.join(test_dir, "data", "items.xlsx")
+    )
+
+    raw_template = ApplicationTemplate(template_path, raw=True)
+    with open(template_path, "rb") as f:
+        data = f.read()
+    # sections in the order of template_nodes, whatever the hash seed
+    assert list(raw_template.template_spans) == raw_template.template_nodes
+    assert list(raw_template.template_child_elements_dict) == (
+        raw_template.template_nodes
+    )
+    for tag, spans in raw_template.template_spans.items():
+        elements = raw_template.template_child_elements_dict[tag]
+        assert [data[start:end].decode("utf-8") for start, end in spans] == elements
+    # entities are kept as in the file
+    assert (
+        "&#xD;&#xA;" in raw_template.template_child_elements_dict["ExportedObjects"][0]
+    )
+
+    documents = []
+    for app_template in (
+        ApplicationTemplate(template_path, streaming=True),
+        raw_template,
+    ):
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders=factory_inputs.factory_placeholders,
+            factory_copy_substrings=factory_inputs.factory_copy_substrings,
+            xml_out_file=os.path.join(tmp_path, "output.xml"),
+            show_progress=False,
+        )
+        app_factory.make_copies_in_folders("ICG-L04M")
+        app_factory.make_document(write_result=False)
+        documents.append(app_factory.xml_builder.to_pretty_xml())
+    assert documents[0] == documents[1]
+
+
+def test_application_factory_manifest_with_premade_copies(tmp_path):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    app_template = ApplicationTemplate(template_path)
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=os.path.join(test_dir, "data", "items.xlsx"), sheetname="ICG"
+    )
+    manifest_file = os.path.join(tmp_path, "manifest.json")
+
+    records = []
+    for make_copies_first in (False, True, True):
+        manifest = BuildManifest(manifest_file)
+        app_factory = ApplicationFactory(
+            template_child_elements_dict=app_template.template_child_elements_dict,
+            factory_placeholders=factory_inputs.factory_placeholders,
+            factory_copy_substrings=factory_inputs.factory_copy_substrings,
+            xml_out_file=os.path.join(tmp_path, "output.xml"),
+            show_progress=False,
+            manifest=manifest,
+        )
+        if make_copies_first:
+            app_factory.make_copies()
+        app_factory.make_document(max_items_per_file=3)
+        records.append((len(manifest.written), len(manifest.skipped)))
+
+    # premade copies hash the same inputs as copies made by make_document
+    number_of_files = records[0][0]
+    assert number_of_files > 1
+    assert records == [(number_of_files, 0), (0, number_of_files), (0, number_of_files)]
+
+
+def test_application_factory_make_document_without_progress_is_quiet(tmp_path, capsys):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+    app_template = ApplicationTemplate(template_path)
+    factory_inputs = FactoryInputsFromSpreadsheet(
+        xlfile=item_workbook_path, sheetname="IT1"
+    )
+    capsys.readouterr()
+    app_factory = ApplicationFactory(
+        template_child_elements_dict=app_template.template_child_elements_dict,
+        factory_placeholders=factory_inputs.factory_placeholders,
+        factory_copy_substrings=factory_inputs.factory_copy_substrings,
+        xml_out_file=os.path.join(tmp_path, "output.xml"),
+        show_progress=False,
+    )
+    app_factory.make_document(max_items_per_file=3)
+
+    # as in make_documents_in_workers, nothing is reported without show_progress
+    assert capsys.readouterr().out == ""
+    assert os.path.exists(os.path.join(tmp_path, "output_1.xml"))
+
+
+def test_application_factory_manager_without_progress_is_quiet(capsys):
+    test_dir = os.path.dirname(__file__)
+    template_path = os.path.join(
+        test_dir,
+        "data",
+        "Emergency Lighting Group ICG-L04M EBO app Export 2024-04-19.xml",
+    )
+    item_workbook_path = os.path.join(test_dir, "data", "items.xlsx")
+
+    ApplicationFactoryManager(
+        template_map={"ICG": {"templateFilename": template_path}},
+        xlfile=item_workbook_path,
+        sheetname="ICG",
+        show_progress=False,
+    )
+
+    # the factory inputs are read without reporting either
+    assert capsys.readouterr().out == ""
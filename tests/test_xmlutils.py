@@ -0,0 +1,88 @@
+import os
+import xml.etree.ElementTree as ET
+from ebo_app_factory.xml_app_factory import ApplicationTemplate
+from ebo_app_factory.xmlutils import (
+    TemplateIndex,
+    build_parent_map,
+    find_child_elements_in_folder,
+    find_child_elements_in_folders,
+    find_elements_in_folders,
+)
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "data",
+    "Zoneworks XT Hive Controller 1 EBO app Export 2024-04-19.xml",
+)
+
+
+def test_find_elements_in_folders_walks_the_tree_once():
+    folder_names = ["Variables", "Alarms", "Setpoints"]
+    tree = ET.parse(TEMPLATE_PATH)
+
+    elements = find_child_elements_in_folders(tree, folder_names)
+
+    # grouped in the order of folder_names, as when each folder was searched on its own
+    expected = []
+    for folder_name in folder_names:
+        expected.extend(find_child_elements_in_folder(TEMPLATE_PATH, folder_name))
+    assert [(e.tag, e.attrib) for e in elements] == [
+        (e.tag, e.attrib) for e in expected
+    ]
+    assert {e.get("FOLDER") for e in elements} == {"Variables", "Alarms"}
+    assert [(e.tag, e.attrib) for e in elements] == [
+        (e.tag, e.attrib) for e in find_elements_in_folders(TEMPLATE_PATH, folder_names)
+    ]
+    # the parsed tree is not changed
+    assert all("FOLDER" not in e.attrib for e in tree.getroot().iter())
+
+
+def test_find_child_elements_in_folder_finds_one_folder():
+    variables = find_child_elements_in_folder(TEMPLATE_PATH, "Variables")
+
+    assert variables and {e.get("FOLDER") for e in variables} == {"Variables"}
+    # every folder of the template has a NAME
+    assert find_child_elements_in_folder(TEMPLATE_PATH) == []
+    # a folder name given twice gets a group of its own each time
+    repeated = find_elements_in_folders(TEMPLATE_PATH, ["Variables", "Variables"])
+    assert [(e.tag, e.attrib) for e in repeated] == [
+        (e.tag, e.attrib) for e in variables + variables
+    ]
+
+
+def test_template_index_looks_up_objects_by_name_type_and_path():
+    index = ApplicationTemplate(TEMPLATE_PATH).get_index()
+    tree_index = TemplateIndex(ET.parse(TEMPLATE_PATH))
+    controller = "Zoneworks XT Hive Controller 1"
+
+    for lookup in (index, tree_index):
+        variables = lookup.get_children(controller + "/Variables")
+        assert [e.get("NAME") for e in variables][:3] == [
+            "CommsAlm",
+            "Flt",
+            "UncommissionedAlm",
+        ]
+        flt = lookup.get_element(controller + "/Variables/Flt")
+        assert flt is variables[1]
+        assert lookup.get_path(flt) == controller + "/Variables/Flt"
+        assert lookup.get_parent(flt) is lookup.get_element(controller + "/Variables")
+        assert lookup.find_by_name("Variables") == [lookup.get_parent(flt)]
+        assert [e.get("NAME") for e in lookup.find_by_type("alarm.SumAlarm")] == [
+            "Sum Alarm"
+        ]
+        alarms = lookup.find_by_type_prefix("alarm.")
+        assert len(alarms) == 14
+        assert all(e.get("TYPE").startswith("alarm.") for e in alarms)
+        assert [e.get("NAME") for e in lookup.iter_descendants(controller + "/Trends")][
+            :3
+        ] == ["Logs", "AlarmCode", "Running"]
+        assert lookup.get_children("missing/path") == []
+
+    # the same parent map as build_parent_map, below the top level objects
+    root = ET.parse(TEMPLATE_PATH).getroot()
+    exported_objects = root.find("ExportedObjects")
+    assert TemplateIndex(root).parent_map == {
+        child: parent
+        for child, parent in build_parent_map(exported_objects).items()
+        if parent is not exported_objects
+    }